@@ -0,0 +1,130 @@
+# Hashes the exercise media library once, groups byte-identical files, checks
+# that every exercise_images / STRETCHING_GIFS reference resolves and writes the
+# manifest the app loads at startup via load_asset_manifest().
+#
+#   python asset_index.py           # index + report; exits 1 on missing references
+#   python asset_index.py --store   # also materialise one content-addressed blob per unique file
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+from shared_utils import (
+    ASSET_MANIFEST, ASSET_STORE, MEDIA_ROOT, RENDITION_DIR, STRETCHING_GIFS,
+    load_asset_manifest, load_catalog,
+)
+
+MEDIA_SUFFIXES = {".gif", ".jpg", ".jpeg", ".png", ".webp"}
+
+def library_files():
+    skip = (RENDITION_DIR, ASSET_STORE)
+    return sorted(
+        p.as_posix() for p in MEDIA_ROOT.rglob("*")
+        if p.is_file() and p.suffix.lower() in MEDIA_SUFFIXES
+        and not any(d in p.parents for d in skip)
+    )
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def store_path(digest, src):
+    return (ASSET_STORE / f"{digest[:16]}{Path(src).suffix.lower()}").as_posix()
+
+def materialise(src, dst):
+    # dst is named by content digest, so an existing file already has the right bytes.
+    # Concurrent callers (sessions publishing the same GIF) each use their own temp name.
+    dst = Path(dst)
+    if dst.exists():
+        return
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=dst.parent, suffix=".tmp")
+    os.close(fd)
+    try:
+        os.unlink(tmp)
+        try:
+            os.link(src, tmp)
+        except OSError:
+            # Different filesystem or no hardlink support
+            shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+    except OSError:
+        if not dst.exists():
+            raise
+    finally:
+        if os.path.lexists(tmp):
+            os.unlink(tmp)
+
+def index(store=False):
+    cfg = load_catalog()
+    old = load_asset_manifest().get("files", {})
+
+    files = {}
+    blobs = {}
+    for src in library_files():
+        stat = Path(src).stat()
+        prev = old.get(src)
+        if prev and prev["bytes"] == stat.st_size and prev["mtime"] == stat.st_mtime:
+            digest = prev["sha256"]
+        else:
+            digest = file_digest(src)
+        files[src] = {"sha256": digest, "bytes": stat.st_size, "mtime": stat.st_mtime}
+        blob = blobs.setdefault(digest, {"bytes": stat.st_size, "paths": []})
+        blob["paths"].append(src)
+
+    refs = sorted(set(cfg.get("exercise_images", {}).values()) | set(STRETCHING_GIFS))
+    references = {ref: files[ref]["sha256"] if ref in files else None for ref in refs}
+    missing = [ref for ref, digest in references.items() if digest is None]
+    referenced = {d for d in references.values() if d}
+    unreferenced = [src for src, f in files.items() if src not in references]
+
+    for digest, blob in blobs.items():
+        if store and digest in referenced:
+            blob["store"] = store_path(digest, blob["paths"][0])
+            materialise(blob["paths"][0], blob["store"])
+
+    ASSET_MANIFEST.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=ASSET_MANIFEST.parent, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump({
+            "version": 1,
+            "files": files,
+            "blobs": blobs,
+            "references": references,
+            "missing": missing,
+            "unreferenced": unreferenced,
+        }, f, indent=2)
+    os.replace(tmp, ASSET_MANIFEST)
+    return files, blobs, references, missing, unreferenced
+
+def report(files, blobs, references, missing, unreferenced):
+    total = sum(f["bytes"] for f in files.values())
+    unique = sum(b["bytes"] for b in blobs.values())
+    print(f"indexed  {len(files)} files, {len(blobs)} unique: {total // 1024} KB -> {unique // 1024} KB")
+    for blob in blobs.values():
+        if len(blob["paths"]) > 1:
+            print(f"dupe     {' = '.join(blob['paths'])} ({blob['bytes'] // 1024} KB)")
+    for src in unreferenced:
+        print(f"unused   {src}")
+    for ref in missing:
+        print(f"missing  {ref}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Index, dedupe and check the exercise media library.")
+    parser.add_argument("--store", action="store_true",
+                        help=f"write one content-addressed copy of each referenced file to {ASSET_STORE}")
+    args = parser.parse_args()
+    result = index(store=args.store)
+    report(*result)
+    if result[3]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# Cold-start benchmark for the dashboard: time from `streamlit run` process start,
+# and from each new session's websocket connect, to the first dashboard paint
+# (the page title arriving as a delta). Results go to JSON; exits 1 over budget.
+#
+#   python bench_startup.py                          # 5 sessions -> startup_baseline.json
+#   python bench_startup.py --no-summary             # also drop the precomputed program summary
+#   python bench_startup.py --budget-process 6 --budget-connect 0.5
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from load_test import free_port, percentile, start_server
+from program_schedule import SUMMARY_PATH
+from state_store import clear_checkpoint, scratch_db
+
+APP = "exercise_app.py"
+PAINT_MARKER = "My Exercise Regime"
+STARTUP_USER = "startup"
+# Seconds. The first session also pays for the first script run (imports, catalog)
+BUDGETS = {
+    "process_to_paint": 5.0,
+    "first_connect_to_paint": 1.5,
+    "connect_to_paint_p95": 0.5,
+}
+
+def rerun_message(user):
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+
+    msg = BackMsg()
+    msg.rerun_script.query_string = f"user={user}"
+    return msg.SerializeToString()
+
+def painted(msg):
+    if msg.WhichOneof("type") != "delta" or msg.delta.WhichOneof("type") != "new_element":
+        return False
+    element = msg.delta.new_element
+    kind = element.WhichOneof("type")
+    return kind in ("heading", "markdown") and PAINT_MARKER in getattr(element, kind).body
+
+async def connect_to_paint(port, timeout=30):
+    # Seconds from opening the session's websocket to the dashboard title arriving
+    import websockets
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+    started = time.monotonic()
+    ws = await websockets.connect(f"ws://127.0.0.1:{port}/_stcore/stream", subprotocols=["streamlit"], max_size=None)
+    try:
+        await ws.send(rerun_message(STARTUP_USER))
+        deadline = started + timeout
+        while time.monotonic() < deadline:
+            try:
+                raw = await asyncio.wait_for(ws.recv(), deadline - time.monotonic())
+            except websockets.ConnectionClosed:
+                raise RuntimeError("connection closed before the dashboard painted")
+            msg = ForwardMsg()
+            msg.ParseFromString(raw)
+            if painted(msg):
+                return time.monotonic() - started
+        raise RuntimeError("dashboard did not paint in time")
+    finally:
+        await ws.close()
+
+async def measure(port, sessions):
+    return [await connect_to_paint(port) for _ in range(sessions)]
+
+def run(sessions, drop_summary):
+    # The dashboard, not a resumed workout
+    for kind in ("hiit", "strength"):
+        clear_checkpoint(kind, STARTUP_USER)
+    if drop_summary:
+        SUMMARY_PATH.unlink(missing_ok=True)
+
+    port = free_port()
+    launched = time.monotonic()
+    proc = start_server(port, APP)
+    try:
+        server_up = time.monotonic() - launched
+        connects = asyncio.run(measure(port, sessions))
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+    warm = connects[1:] or connects
+    return {
+        "server_up": round(server_up, 4),
+        "process_to_paint": round(server_up + connects[0], 4),
+        "first_connect_to_paint": round(connects[0], 4),
+        "connect_to_paint_p50": round(statistics.median(warm), 4),
+        "connect_to_paint_p95": percentile(warm, 95),
+        "connects": [round(c, 4) for c in connects],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure dashboard cold start against a budget.")
+    parser.add_argument("--sessions", type=int, default=5, help="sessions connected one after another")
+    parser.add_argument("--no-summary", action="store_true", help="delete the program summary first (fully cold)")
+    parser.add_argument("--budget-process", type=float, default=BUDGETS["process_to_paint"])
+    parser.add_argument("--budget-first", type=float, default=BUDGETS["first_connect_to_paint"])
+    parser.add_argument("--budget-connect", type=float, default=BUDGETS["connect_to_paint_p95"])
+    parser.add_argument("--out", default="startup_baseline.json")
+    args = parser.parse_args()
+
+    # The server's sessions record state in a throwaway database, not hiit_state.db
+    with scratch_db():
+        result = run(args.sessions, args.no_summary)
+    budgets = {
+        "process_to_paint": args.budget_process,
+        "first_connect_to_paint": args.budget_first,
+        "connect_to_paint_p95": args.budget_connect,
+    }
+    over = []
+    for metric, budget in budgets.items():
+        mark = "  OVER BUDGET" if result[metric] > budget else ""
+        print(f"{metric:24} {result[metric]:8.3f}s  (budget {budget:.2f}s){mark}")
+        if mark:
+            over.append(metric)
+
+    with open(args.out, "w") as f:
+        json.dump({"version": 1, "app": APP, "budgets": budgets, "result": result}, f, indent=2)
+    if over:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
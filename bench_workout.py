@@ -0,0 +1,327 @@
+# Headless benchmark: drives the app through whole workouts with Streamlit's
+# AppTest and a fake clock, recording per-rerun wall time, delta messages,
+# HTML/CSS bytes and media bytes. Results go to a JSON baseline for comparison.
+#
+#   python bench_workout.py                                 # all scenarios -> bench_baseline.json
+#   python bench_workout.py --compare bench_baseline.json   # flag regressions against an older run
+#
+# A scenario fails (exit 1, no baseline written) when a run raises or the workout doesn't finish.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import interval_scheduler
+import media_route
+import pyramid_hiit_streamlit as hiit
+import strength_mode as strength
+from program_schedule import program_for
+from shared_utils import load_catalog, media_for
+from state_store import clear_checkpoint, save_user_state, scratch_db
+
+BENCH_USER = "bench"
+# Functions whose markdown output is reported separately
+HTML_EMITTERS = ("inject_hiit_css", "show_pyramid_progress")
+COMPARED = ("reruns", "wall_ms_total", "wall_ms_p95", "deltas", "delta_bytes", "html_bytes", "media_bytes")
+REGRESSION = 1.10
+
+# ---------------------------
+# Fake clock
+# ---------------------------
+# Stands in for the time module in the scheduler and the HIIT screen, so a
+# full workout's sleeps cost nothing and every tick lands exactly on time.
+class FakeClock:
+    def __init__(self, start=1000.0):
+        self.now = start
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def time_ns(self):
+        return int(self.now * 1e9)
+
+    def sleep(self, seconds):
+        self.now += max(0.0, seconds)
+
+# ---------------------------
+# Recorder
+# ---------------------------
+class Recorder:
+    def __init__(self):
+        self.reruns = []
+        self.current = None
+        self.emitters = []
+        self.fetched = set()
+
+    def start(self, screen):
+        self.current = {"screen": screen, "wall_ms": 0.0, "deltas": 0, "delta_bytes": 0,
+                        "html_bytes": {}, "media_bytes": 0, "media_requests": 0}
+        self.reruns.append(self.current)
+        return self.current
+
+    def delta(self, delta_type, proto):
+        if self.current is None:
+            return
+        self.current["deltas"] += 1
+        self.current["delta_bytes"] += proto.ByteSize()
+        if delta_type == "markdown":
+            emitter = self.emitters[-1] if self.emitters else "other"
+            html = self.current["html_bytes"]
+            html[emitter] = html.get(emitter, 0) + len(proto.body.encode())
+
+    def media(self, path, cached=False):
+        # cached: served from a static URL, so the browser downloads each file once per scenario
+        if self.current is None or not isinstance(path, (str, os.PathLike)):
+            return
+        if cached:
+            if path in self.fetched:
+                return
+            self.fetched.add(path)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        self.current["media_bytes"] += size
+        self.current["media_requests"] += 1
+
+    def summary(self):
+        walls = sorted(r["wall_ms"] for r in self.reruns) or [0.0]
+        html = {}
+        for r in self.reruns:
+            for k, v in r["html_bytes"].items():
+                html[k] = html.get(k, 0) + v
+        return {
+            "reruns": len(self.reruns),
+            "wall_ms_total": round(sum(walls), 2),
+            "wall_ms_p50": round(statistics.median(walls), 2),
+            "wall_ms_p95": round(walls[int(0.95 * (len(walls) - 1))], 2),
+            "wall_ms_max": round(walls[-1], 2),
+            "deltas": sum(r["deltas"] for r in self.reruns),
+            "delta_bytes": sum(r["delta_bytes"] for r in self.reruns),
+            "html_bytes": sum(html.values()),
+            "html_bytes_by_emitter": html,
+            "media_bytes": sum(r["media_bytes"] for r in self.reruns),
+            "media_requests": sum(r["media_requests"] for r in self.reruns),
+            "per_rerun": self.reruns,
+        }
+
+@contextmanager
+def instrumented(rec, clock):
+    from streamlit.delta_generator import DeltaGenerator
+
+    patched = []
+
+    def patch(owner, name, value):
+        patched.append((owner, name, getattr(owner, name)))
+        setattr(owner, name, value)
+
+    enqueue = DeltaGenerator._enqueue
+    def hooked_enqueue(self, delta_type, element_proto, *args, **kwargs):
+        rec.delta(delta_type, element_proto)
+        return enqueue(self, delta_type, element_proto, *args, **kwargs)
+    patch(DeltaGenerator, "_enqueue", hooked_enqueue)
+
+    def hooked_image(show_image):
+        def wrapper(path, *args, **kwargs):
+            rec.media(path, cached=media_route.static_media_enabled())
+            return show_image(path, *args, **kwargs)
+        return wrapper
+    def hooked_media(show_media):
+        # Counted at the desktop (400 px) rendition
+        def wrapper(image, *args, **kwargs):
+            rec.media(media_for(image), cached=media_route.static_media_enabled())
+            return show_media(image, *args, **kwargs)
+        return wrapper
+    for module in (hiit, strength):
+        patch(module, "show_image", hooked_image(module.show_image))
+        patch(module, "show_media", hooked_media(module.show_media))
+
+    def screen(fn, name):
+        # One entry per script or fragment run that reaches this screen; st.rerun() ends it early.
+        # Nested screens (the stage fragment inside a full run) belong to the outer entry.
+        def wrapper(*args, **kwargs):
+            if rec.current is not None:
+                return fn(*args, **kwargs)
+            entry = rec.start(name)
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                entry["wall_ms"] = round((time.perf_counter() - started) * 1000, 3)
+                rec.current = None
+        return wrapper
+
+    def emitter(fn, name):
+        def wrapper(*args, **kwargs):
+            rec.emitters.append(name)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                rec.emitters.pop()
+        return wrapper
+
+    patch(hiit, "main", screen(hiit.main, "hiit"))
+    patch(hiit, "show_workout_stage", screen(hiit.show_workout_stage, "hiit_stage"))
+    patch(strength, "show_strength_screen", screen(strength.show_strength_screen, "strength"))
+    for name in HTML_EMITTERS:
+        patch(hiit, name, emitter(getattr(hiit, name), name))
+
+    fake_time = SimpleNamespace(monotonic=clock.monotonic, time=clock.time, time_ns=clock.time_ns, sleep=clock.sleep)
+    patch(interval_scheduler, "time", fake_time)
+    patch(hiit, "time", fake_time)
+    try:
+        yield
+    finally:
+        for owner, name, value in reversed(patched):
+            setattr(owner, name, value)
+
+# ---------------------------
+# Scenarios
+# ---------------------------
+class ScenarioFailed(Exception):
+    pass
+
+def checked(at):
+    # A run that raised still renders (with an exception element), so fail loudly here
+    if at.exception:
+        raise ScenarioFailed(at.exception[0].message)
+    return at
+
+def expect(at, done, what):
+    if not done:
+        raise ScenarioFailed(f"ended before {what}")
+    return at
+
+def click(at, label=None, key=None, timeout=600):
+    button = next((b for b in at.button if (key and b.key == key) or (label and b.label == label)), None)
+    if button is None:
+        raise ScenarioFailed(f"no button {label or key!r} on screen")
+    return checked(button.click().run(timeout=timeout))
+
+def new_app(script, **settings):
+    from streamlit.testing.v1 import AppTest
+
+    save_user_state(settings, BENCH_USER)
+    # Start from the dashboard/setup screen, not a resumed workout from an earlier run
+    for kind in ("hiit", "strength"):
+        clear_checkpoint(kind, BENCH_USER)
+    at = AppTest.from_string(script) if "\n" in script else AppTest.from_file(script)
+    at.query_params["user"] = BENCH_USER
+    return checked(at.run(timeout=60))
+
+def program_day(kind):
+    return next(day for day in program_for({}).days if day.type == kind)
+
+def run_pyramid():
+    # The standalone HIIT page, via the imported module so the hooks apply
+    at = new_app("import pyramid_hiit_streamlit as hiit\nhiit.main()\n", timer_mode="server")
+    click(at, label="🚀 START WORKOUT")
+    return expect(at, at.session_state["workout_phase"] == "complete", "the workout completed")
+
+def run_program_hiit(day):
+    at = new_app("exercise_app.py", current_program_day=day.number, timer_mode="server")
+    click(at, label="🚀 START WORKOUT")
+    click(at, label="🚀 START WORKOUT")
+    return expect(at, at.session_state["workout_phase"] == "complete", "the workout completed")
+
+def run_program_strength(day, sequence):
+    at = new_app("exercise_app.py", current_program_day=day.number)
+    click(at, label="🚀 START WORKOUT")
+    for _ in range(200):
+        if at.session_state["strength_exercise_index"] >= len(sequence):
+            break
+        click(at, key="clickable_img_overlay")
+    return expect(at, at.session_state["strength_exercise_index"] >= len(sequence), "the last exercise")
+
+def scenarios():
+    strength_day = program_day("strength")
+    sequence = load_catalog()["exercise_sequences"][strength_day.sequence]
+    return {
+        "pyramid": run_pyramid,
+        "program_hiit": lambda: run_program_hiit(program_day("hiit")),
+        "program_strength": lambda: run_program_strength(strength_day, sequence),
+    }
+
+def run(names):
+    # (results, {scenario: error}); a failed scenario gets no result
+    results, failed = {}, {}
+    for name, scenario in scenarios().items():
+        if names and name not in names:
+            continue
+        rec = Recorder()
+        started = time.perf_counter()
+        try:
+            with instrumented(rec, FakeClock()):
+                scenario()
+        except ScenarioFailed as e:
+            failed[name] = str(e)
+            print(f"{name:18} FAILED after {len(rec.reruns)} reruns: {e}")
+            continue
+        result = rec.summary()
+        result["scenario_s"] = round(time.perf_counter() - started, 2)
+        results[name] = result
+        print(f"{name:18} {result['reruns']:4} reruns  {result['wall_ms_p50']:7.1f} ms p50  "
+              f"{result['wall_ms_p95']:7.1f} ms p95  {result['deltas']:6} deltas  "
+              f"{result['html_bytes'] // 1024:5} KB html  {result['media_bytes'] // 1024:7} KB media")
+    return results, failed
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+def compare(results, baseline):
+    regressed = []
+    for name, result in results.items():
+        old = baseline.get("scenarios", {}).get(name)
+        if not old:
+            continue
+        for metric in COMPARED:
+            before, after = old.get(metric), result.get(metric)
+            if not before or after is None:
+                continue
+            ratio = after / before
+            mark = "  REGRESSION" if ratio > REGRESSION else ""
+            print(f"{name:18} {metric:14} {before:>12} -> {after:>12} ({ratio:5.2f}x){mark}")
+            if mark:
+                regressed.append((name, metric))
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark whole workouts headlessly with AppTest.")
+    parser.add_argument("scenarios", nargs="*", help="subset of: pyramid, program_hiit, program_strength")
+    parser.add_argument("--out", default="bench_baseline.json")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run; exits 1 on regressions")
+    parser.add_argument("--per-rerun", action="store_true", help="keep every rerun's record in the output")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+
+    # Settings, checkpoints and history for BENCH_USER go to a throwaway database
+    with scratch_db():
+        results, failed = run(args.scenarios)
+    if failed:
+        # Never write a baseline from a crashed or unfinished workout
+        raise SystemExit(1)
+    if not args.per_rerun:
+        for result in results.values():
+            result.pop("per_rerun")
+    with open(args.out, "w") as f:
+        json.dump({"version": 1, "commit": git_commit(), "scenarios": results}, f, indent=2)
+
+    if baseline and compare(results, baseline):
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+# Offline build step: transcodes every referenced exercise/stretch image into
+# size-bounded renditions and writes the manifest the app reads via media_for().
+#
+#   python build_assets.py                  # GIF + animated WebP at 200 and 400 px
+#   python build_assets.py --formats gif    # only what st.image can play back
+import argparse
+import io
+import json
+import time
+from pathlib import Path
+
+from shared_utils import RENDITION_DIR, RENDITION_MANIFEST, STRETCHING_GIFS, load_asset_manifest, load_catalog
+
+DEFAULT_HEIGHTS = [200, 400]
+MAX_FRAME_STEP = 8
+
+def referenced_media(cfg):
+    paths = list(cfg.get("exercise_images", {}).values()) + STRETCHING_GIFS
+    return sorted(set(paths))
+
+def load_frames(src):
+    from PIL import Image, ImageSequence
+
+    with Image.open(src) as im:
+        frames = []
+        durations = []
+        for frame in ImageSequence.Iterator(im):
+            frames.append(frame.convert("RGBA"))
+            durations.append(frame.info.get("duration", im.info.get("duration", 100)))
+        return frames, durations, im.size
+
+def encode(frames, durations, fmt, quality):
+    buf = io.BytesIO()
+    if len(frames) == 1:
+        still = frames[0] if fmt in ("png", "webp") else frames[0].convert("RGB")
+        still.save(buf, format=fmt.upper(), quality=quality)
+        return buf.getvalue()
+    if fmt == "gif":
+        frames = [f.convert("RGB") for f in frames]
+    frames[0].save(
+        buf,
+        format=fmt.upper(),
+        save_all=True,
+        append_images=frames[1:],
+        duration=durations,
+        loop=0,
+        optimize=True,
+        quality=quality,
+    )
+    return buf.getvalue()
+
+def build_rendition(frames, durations, size, height, fmt, max_bytes):
+    from PIL import Image
+
+    width = max(1, round(size[0] * height / size[1]))
+    resized = [f.resize((width, height), Image.LANCZOS) for f in frames]
+    # Over budget: halve the frame rate (keeping total duration) and lower quality
+    step, quality = 1, 85
+    while True:
+        picked = resized[::step]
+        picked_durations = [sum(durations[i:i + step]) for i in range(0, len(durations), step)]
+        data = encode(picked, picked_durations, fmt, quality)
+        if len(data) <= max_bytes or step >= MAX_FRAME_STEP or len(picked) == 1:
+            return data, width
+        step *= 2
+        quality = max(50, quality - 15)
+
+def source_format(src):
+    ext = Path(src).suffix.lower().lstrip(".")
+    return "jpeg" if ext in ("jpg", "jpeg") else ext
+
+def build(heights, formats, max_kb, force=False):
+    cfg = load_catalog()
+    old = {}
+    if RENDITION_MANIFEST.exists():
+        with open(RENDITION_MANIFEST, "r") as f:
+            old = json.load(f).get("assets", {})
+
+    # Byte-identical sources (per asset_index.py) share one set of renditions
+    indexed = load_asset_manifest().get("files", {})
+    by_digest = {}
+
+    RENDITION_DIR.mkdir(parents=True, exist_ok=True)
+    assets = {}
+    for src in referenced_media(cfg):
+        path = Path(src)
+        if not path.exists():
+            print(f"missing  {src}")
+            continue
+        stat = path.stat()
+        known = indexed.get(src)
+        digest = known["sha256"] if known and known["bytes"] == stat.st_size and known["mtime"] == stat.st_mtime else None
+        if digest in by_digest:
+            assets[src] = dict(by_digest[digest], mtime=stat.st_mtime)
+            print(f"shared   {src}")
+            continue
+        prev = old.get(src)
+        if (not force and prev and prev["bytes"] == stat.st_size and prev["mtime"] == stat.st_mtime
+                and all(Path(r["path"]).exists() for r in prev["renditions"])):
+            assets[src] = prev
+            if digest:
+                by_digest[digest] = prev
+            continue
+
+        started = time.perf_counter()
+        frames, durations, size = load_frames(src)
+        animated = len(frames) > 1
+        renditions = []
+        # Never upscale: heights above the source collapse onto the source height
+        for height in sorted({min(h, size[1]) for h in heights}):
+            # Stills keep their own format; webp only makes sense for animations
+            for fmt in (formats if animated else [source_format(src)]):
+                max_bytes = int(max_kb * 1024 * (height / 400) ** 2)
+                data, width = build_rendition(frames, durations, size, height, fmt, max_bytes)
+                out = RENDITION_DIR / f"{path.stem}-{height}.{'jpg' if fmt == 'jpeg' else fmt}"
+                out.write_bytes(data)
+                renditions.append({
+                    "path": out.as_posix(),
+                    "format": fmt,
+                    "width": width,
+                    "height": height,
+                    "bytes": len(data),
+                })
+        assets[src] = {
+            "bytes": stat.st_size,
+            "mtime": stat.st_mtime,
+            "width": size[0],
+            "height": size[1],
+            "frames": len(frames),
+            "renditions": renditions,
+        }
+        if digest:
+            by_digest[digest] = assets[src]
+        smallest = min(r["bytes"] for r in renditions)
+        print(f"built    {src}: {stat.st_size // 1024} KB -> {smallest // 1024} KB min "
+              f"({time.perf_counter() - started:.1f}s)")
+
+    with open(RENDITION_MANIFEST, "w") as f:
+        json.dump({"version": 1, "heights": heights, "assets": assets}, f, indent=2)
+    return assets
+
+def main():
+    parser = argparse.ArgumentParser(description="Build size-bounded renditions of the exercise media.")
+    parser.add_argument("--heights", type=int, nargs="+", default=DEFAULT_HEIGHTS)
+    parser.add_argument("--formats", nargs="+", default=["gif", "webp"], choices=["gif", "webp"])
+    parser.add_argument("--max-kb", type=int, default=600, help="byte budget for a 400 px rendition (scaled by area)")
+    parser.add_argument("--force", action="store_true", help="rebuild even if the source is unchanged")
+    args = parser.parse_args()
+    build(args.heights, args.formats, args.max_kb, force=args.force)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+import secrets
+import threading
+import time
+from collections import namedtuple
+
+import streamlit as st
+
+import instrumentation as metrics
+from media_route import show_media
+from pyramid_hiit_streamlit import countdown_timer, workout_formats, workout_plan
+from session_gc import touch, track
+from shared_utils import DEFAULT_USER, STRETCH_TARGETS, format_time, load_config
+from styles import use_stylesheet
+from workout_history import record_workout
+from workout_timeline import compile_timeline, interval_at, rest_playlist, stretch_at
+
+# Participants re-check the shared class this often, to pick up starts, pauses and skips;
+# phase ends don't wait for it (the browser countdown reports them)
+CLASS_POLL_SECONDS = 2.0
+# The instructor's own actions rerun directly; this only refreshes the viewer count
+HOST_POLL_SECONDS = 5.0
+# Finished or abandoned classes are dropped after this long without a viewer
+CLASS_IDLE_SECONDS = 10 * 60
+CODE_ALPHABET = "ABCDEFGHJKMNPQRSTUVWXYZ23456789"
+
+# ---------------------------
+# Shared class timeline
+# ---------------------------
+# One per class, process-wide. Nothing ticks on the server: the position is a
+# pure function of one monotonic clock, so every viewer reading a snapshot sees
+# the same interval and remaining time, and the browser countdown does the
+# per-second work. Instructor actions bump `version`, which restarts every
+# viewer's countdown at the new position.
+ClassState = namedtuple("ClassState", ["version", "started", "paused", "finished", "interval", "elapsed", "remaining"])
+
+class ClassSession:
+    def __init__(self, code, sequence, format_name, timeline, playlist):
+        self.code = code
+        self.sequence = sequence
+        self.format_name = format_name
+        self.timeline = timeline
+        self.playlist = playlist
+        self.version = 0
+        self.started = False
+        self.base_elapsed = 0.0
+        self.resumed_at = None      # monotonic time while running, None while paused
+        self.viewers = {}           # session id -> last seen
+        self.last_seen = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _elapsed(self, now):
+        running = now - self.resumed_at if self.resumed_at is not None else 0.0
+        return min(self.timeline.total, self.base_elapsed + running)
+
+    def snapshot(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            elapsed = self._elapsed(now)
+            finished = elapsed >= self.timeline.total
+            interval = None if finished else interval_at(self.timeline, elapsed)
+            remaining = 0.0 if finished else interval.start + interval.duration - elapsed
+            return ClassState(self.version, self.started, self.started and self.resumed_at is None,
+                              finished, interval, elapsed, remaining)
+
+    def _move(self, base_elapsed, running, now):
+        self.base_elapsed = min(self.timeline.total, base_elapsed)
+        self.resumed_at = now if running else None
+        self.version += 1
+
+    def start(self):
+        now = time.monotonic()
+        with self._lock:
+            self.started = True
+            self._move(self.base_elapsed, True, now)
+
+    def pause(self):
+        now = time.monotonic()
+        with self._lock:
+            self._move(self._elapsed(now), False, now)
+
+    def resume(self):
+        now = time.monotonic()
+        with self._lock:
+            self._move(self._elapsed(now), True, now)
+
+    def skip(self):
+        now = time.monotonic()
+        with self._lock:
+            current = interval_at(self.timeline, self._elapsed(now))
+            self._move(current.start + current.duration, self.resumed_at is not None, now)
+
+    def seen(self, session_id):
+        now = time.monotonic()
+        with self._lock:
+            self.viewers[session_id] = now
+            self.last_seen = now
+
+    def viewer_count(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            return sum(1 for t in self.viewers.values() if now - t < 3 * CLASS_POLL_SECONDS)
+
+def view_key(snap, viewers=None):
+    # What a page shows for a snapshot; a poll that finds the same key emits nothing
+    return (snap.version, snap.finished, snap.interval.index if snap.interval else None, viewers)
+
+_classes_lock = threading.Lock()
+_classes = {}
+
+def _sweep(now):
+    for code in [c for c, cls in _classes.items() if now - cls.last_seen >= CLASS_IDLE_SECONDS]:
+        del _classes[code]
+
+def create_class(cfg, sequence, format_name):
+    exercises = cfg["exercise_sequences"][sequence]
+    timeline = compile_timeline(exercises, cfg, cfg["exercise_images"], workout_plan(cfg, exercises, format_name))
+    with _classes_lock:
+        _sweep(time.monotonic())
+        code = "".join(secrets.choice(CODE_ALPHABET) for _ in range(4))
+        while code in _classes:
+            code = "".join(secrets.choice(CODE_ALPHABET) for _ in range(4))
+        playlist = rest_playlist(timeline, code, STRETCH_TARGETS, cfg.get("exercise_muscles", {}))
+        _classes[code] = ClassSession(code, sequence, format_name, timeline, playlist)
+    return code
+
+def get_class(code):
+    # Every lookup also drops abandoned classes, not just the next create_class
+    with _classes_lock:
+        _sweep(time.monotonic())
+        return _classes.get((code or "").strip().upper())
+
+def end_class(code):
+    with _classes_lock:
+        _classes.pop(code, None)
+
+# ---------------------------
+# Session
+# ---------------------------
+def _session_id():
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else st.session_state.metrics_session
+
+def init_class_session():
+    if "user_id" not in st.session_state:
+        st.session_state.user_id = st.query_params.get("user", DEFAULT_USER)
+    if "config" not in st.session_state:
+        st.session_state.config = load_config(st.session_state.user_id)
+    if "workout_format" not in st.session_state:
+        st.session_state.workout_format = st.session_state.config.get("workout_format", "Pyramid")
+    if "class_code" not in st.session_state:
+        st.session_state.class_code = st.query_params.get("class", "").strip().upper() or None
+    if "metrics_session" not in st.session_state:
+        st.session_state.metrics_session = f"{time.time_ns():x}"[-8:]
+    metrics.bind(session=st.session_state.metrics_session, phase="class")
+
+def leave_class():
+    if st.session_state.get("class_host") == st.session_state.class_code:
+        end_class(st.session_state.class_code)
+        st.session_state.class_host = None
+    st.session_state.class_code = None
+    st.session_state.class_recorded = None
+    # Back to the dashboard when class mode was opened from exercise_app
+    st.session_state.class_mode = False
+    st.query_params.pop("class", None)
+
+# ---------------------------
+# UI screens
+# ---------------------------
+def show_lobby():
+    cfg = st.session_state.config
+    st.title("👥 Class Mode")
+    host_col, join_col = st.columns(2)
+    with host_col:
+        st.subheader("Host a class")
+        categories = cfg.get("sequence_categories", {})
+        sequences = [k for k, v in categories.items() if v == "hiit"] or list(cfg["exercise_sequences"])
+        sequence = st.selectbox("Sequence:", sequences)
+        formats = list(workout_formats(cfg))
+        format_name = st.selectbox("Workout format:", formats,
+                                   index=formats.index(st.session_state.workout_format)
+                                   if st.session_state.workout_format in formats else 0)
+        if st.button("Create class", type="primary"):
+            try:
+                code = create_class(cfg, sequence, format_name)
+            except ValueError as e:
+                st.error(f"Workout format {format_name!r}: {e}")
+                return
+            st.session_state.class_code = st.session_state.class_host = code
+            st.query_params["class"] = code
+            st.rerun()
+    with join_col:
+        st.subheader("Join a class")
+        code = st.text_input("Class code:", max_chars=4).strip().upper()
+        if st.button("Join", disabled=not code):
+            st.session_state.class_code = code
+            st.query_params["class"] = code
+            st.rerun()
+
+def show_class_sidebar(cls, host):
+    st.title("👥 Class " + cls.code)
+    st.markdown(f"### {cls.sequence} · {cls.format_name}")
+    st.markdown(f"**{'Instructor' if host else 'Participant'}** · Total {format_time(cls.timeline.total)}")
+    if host:
+        st.caption(f"Share the code {cls.code} or this page's link; participants follow along read-only.")
+    if st.button("Leave class"):
+        leave_class()
+        st.rerun()
+
+# Runs on its own every few seconds and renders nothing. Only when the class has moved
+# on (a new phase, a start, pause or skip) does it rerun the page, so the stage, the
+# countdown and the media are re-sent once per change rather than once per poll.
+def watch_class():
+    # A viewer's session may only see these fragment runs for a long time
+    touch()
+    cls = get_class(st.session_state.get("class_code"))
+    if cls is None:
+        # Ended: the full run shows it and stops polling
+        st.rerun()
+    host = st.session_state.get("class_host") == cls.code
+    cls.seen(_session_id())
+    if view_key(cls.snapshot(), cls.viewer_count() if host else None) != st.session_state.get("class_view"):
+        st.rerun()
+
+def show_class_stage(cls, host):
+    snap = cls.snapshot()
+    viewers = cls.viewer_count() if host else None
+    st.session_state.class_view = view_key(snap, viewers)
+
+    if host:
+        c1, c2, c3, c4 = st.columns(4)
+        if not snap.started:
+            c1.button("▶️ Start", on_click=cls.start, type="primary", use_container_width=True)
+        elif snap.paused:
+            c1.button("▶️ Resume", on_click=cls.resume, type="primary", use_container_width=True)
+        else:
+            c1.button("⏸ Pause", on_click=cls.pause, use_container_width=True)
+        c2.button("⏭ Skip", on_click=cls.skip, disabled=snap.finished or not snap.started, use_container_width=True)
+        c3.metric("Viewers", viewers)
+        c4.metric("Round", f"{snap.interval.round}/{len(cls.timeline.labels)}" if snap.interval else "—")
+
+    if snap.finished:
+        st.success("🎉 CLASS COMPLETE! Amazing job!")
+        # Anonymous participants (no ?user=) would all land on the shared default user's history
+        if st.session_state.get("class_recorded") != cls.code and (host or st.session_state.user_id != DEFAULT_USER):
+            st.session_state.class_recorded = cls.code
+            record_workout("hiit", cls.sequence, f"class:{cls.code}", st.session_state.user_id)
+        return False
+
+    iv = snap.interval
+    if not snap.started:
+        st.info(f"Waiting for the instructor to start · {' → '.join(cls.timeline.labels)}")
+    if iv.phase == "work":
+        label, phase_class, image = f"💪 {iv.exercise}", "work-phase", iv.image
+    elif iv.phase == "prepare":
+        label, phase_class, image = "GET READY!", "rest-phase", iv.image
+    else:
+        label, phase_class = f"NEXT: {iv.exercise}", "rest-phase"
+        image = stretch_at(cls.playlist, iv, snap.remaining)
+    if snap.paused:
+        label += " · ⏸ PAUSED"
+
+    gif_col, timer_col = st.columns([2, 1])
+    with gif_col:
+        st.markdown(f"<div class='exercise-name'>{label}</div>", unsafe_allow_html=True)
+        if image:
+            show_media(image, use_container_width=True)
+        else:
+            st.markdown("<div class='gif-blank'></div>", unsafe_allow_html=True)
+    with timer_col:
+        # Same phase_id, same deadline in the browser: only a version bump or a new interval restarts it
+        phase_id = f"class:{cls.code}:{snap.version}:{iv.index}"
+        event = countdown_timer(
+            phase_id=phase_id,
+            seconds=round(snap.remaining, 2),
+            elapsed=round(snap.elapsed, 2),
+            total=cls.timeline.total,
+            phase_class=phase_class,
+            paused=snap.paused or not snap.started,
+            key="class_countdown",
+            default=None,
+        )
+    # The browser finished the phase a moment before the shared clock did: catch up, then show the next one
+    if event and event.get("phase_id") == phase_id and not snap.paused:
+        time.sleep(min(snap.remaining, 1.0))
+        st.rerun()
+    return True
+
+def main():
+    init_class_session()
+    metrics.count("reruns", screen="class")
+    use_stylesheet("hiit")
+    cls = get_class(st.session_state.class_code)
+    if st.session_state.class_code and cls is None:
+        st.error(f"No class with code {st.session_state.class_code}.")
+        if st.button("Back"):
+            leave_class()
+            st.rerun()
+        return
+    if cls is None:
+        show_lobby()
+        return
+    host = st.session_state.get("class_host") == cls.code
+    cls.seen(_session_id())
+    with st.sidebar:
+        show_class_sidebar(cls, host)
+    if show_class_stage(cls, host):
+        # Nothing to watch once the class has finished
+        st.fragment(watch_class, run_every=HOST_POLL_SECONDS if host else CLASS_POLL_SECONDS)()
+
+if __name__ == "__main__":
+    st.set_page_config(page_title="HIIT Class", page_icon="👥", layout="wide")
+    track()
+    # The class registry has to live in the imported module: this script body re-runs every time
+    import class_mode
+    class_mode.main()
@@ -1,49 +1,58 @@
 import streamlit as st
 import datetime
-from shared_utils import load_config, save_config
-import pyramid_hiit_streamlit as hiit
-import strength_mode as strength
+from shared_utils import DEFAULT_USER, load_config
+from program_schedule import (
+    load_programs, next_position, position_for, program_for, save_position, upcoming_calendar,
+)
+from state_store import clear_checkpoint, resumable_checkpoint
+from workout_history import average_rest, streak, weekly_volume
+from session_gc import drop_workout_state, track
 
 # Set page config for the entire app
 st.set_page_config(page_title="Personal Exercise Regime", page_icon="💪", layout="wide")
 
-PROGRAM_DAYS = {
-    1: {"name": "Strength (Leg Day)", "type": "strength", "sequence": "Leg Day"},
-    2: {"name": "HIIT / Aerobic", "type": "hiit", "sequence": "Classic HIIT"},
-    3: {"name": "Rest", "type": "rest"},
-    4: {"name": "Strength (Full Body)", "type": "strength", "sequence": "Full Body"},
-    5: {"name": "HIIT / Aerobic", "type": "hiit", "sequence": "Classic HIIT"},
-    6: {"name": "Rest", "type": "rest"},
-    7: {"name": "Strength (Upper Body)", "type": "strength", "sequence": "Upper Body"},
-    8: {"name": "HIIT / Aerobic", "type": "hiit", "sequence": "Classic HIIT"},
-    9: {"name": "Rest", "type": "rest"},
-}
-
 def init_app_state():
+    if "user_id" not in st.session_state:
+        st.session_state.user_id = st.query_params.get("user", DEFAULT_USER)
     if "config" not in st.session_state:
-        st.session_state.config = load_config()
+        st.session_state.config = load_config(st.session_state.user_id)
     
     cfg = st.session_state.config
-    if "current_program_day" not in cfg:
-        cfg["current_program_day"] = 1
-        save_config(cfg)
+    program = program_for(cfg)
+    position = position_for(cfg, program)
+    if cfg.get("current_program") != program.name or cfg.get("current_program_day") != position:
+        save_position(cfg, program, position, st.session_state.user_id)
     
     if "active_workout" not in st.session_state:
-        st.session_state.active_workout = False
+        # A reconnecting client goes straight back into today's unfinished workout, if it's still resumable
+        today = today_info()
+        st.session_state.active_workout = (
+            today.type != "rest"
+            and resumable_checkpoint(today.type, st.session_state.user_id, today.sequence) is not None
+        )
+
+def today_info():
+    # Today's entry via the precomputed calendar (a dict lookup, whatever the program length)
+    cfg = st.session_state.config
+    program = program_for(cfg)
+    today = datetime.date.today()
+    return upcoming_calendar(program, position_for(cfg, program), today)[today]
 
 def show_dashboard():
     st.title("🏋️ My Exercise Regime")
     cfg = st.session_state.config
-    current_day = cfg.get("current_program_day", 1)
+    programs = load_programs()
+    program = program_for(cfg)
+    current_day = position_for(cfg, program)
     
     col1, col2 = st.columns([1, 1])
     
     with col1:
         st.subheader("Today's Schedule")
-        day_info = PROGRAM_DAYS[current_day]
-        st.info(f"### {day_info['name']}")
+        today = today_info()
+        st.info(f"### {today.name}")
         
-        if day_info['type'] == 'rest':
+        if today.type == 'rest':
             st.write("Enjoy your rest day! Recharge for tomorrow.")
             if st.button("Complete Day & Advance"):
                 advance_day()
@@ -51,10 +60,20 @@ def show_dashboard():
             if st.button("🚀 START WORKOUT", type="primary"):
                 st.session_state.active_workout = True
                 st.rerun()
+        if st.button("👥 Host or join a class"):
+            st.session_state.class_mode = True
+            st.rerun()
 
     with col2:
+        if len(programs) > 1:
+            names = list(programs)
+            selected_program = st.selectbox("Program:", names, index=names.index(program.name))
+            if selected_program != program.name:
+                save_position(cfg, programs[selected_program], 1, st.session_state.user_id)
+                st.rerun()
+
         # Day selection with radio buttons
-        day_options = {d: f"Day {d}: {info['name']}" for d, info in PROGRAM_DAYS.items()}
+        day_options = {day.number: f"Day {day.number}: {day.name}" for day in program.days}
         selected_day_label = st.radio(
             "Go to Day:",
             options=list(day_options.keys()),
@@ -64,50 +83,106 @@ def show_dashboard():
         )
         
         if selected_day_label != current_day:
-            cfg["current_program_day"] = selected_day_label
-            save_config(cfg)
+            save_position(cfg, program, selected_day_label, st.session_state.user_id)
             st.rerun()
 
+        show_upcoming(program, current_day)
+
+    show_history_panel()
+
+def show_upcoming(program, position, days=7):
+    calendar = upcoming_calendar(program, position, datetime.date.today())
+    st.markdown("**Coming up**")
+    st.caption("  \n".join(
+        f"{date:%a %d %b}: {day.name}" for date, day in list(calendar.items())[1:days + 1]
+    ))
+
+# Reads only the pre-aggregated rollups, so it stays fast however long the history gets
+def show_history_panel():
+    user = st.session_state.user_id
+    st.markdown("---")
+    st.subheader("📈 History")
+    current, longest, workouts = streak(user)
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Current streak", f"{current} days")
+    c2.metric("Longest streak", f"{longest} days")
+    c3.metric("Workouts", workouts)
+
+    rests = average_rest(user)
+    if rests:
+        st.caption(" · ".join(
+            f"{phase.replace('_', ' ')}: {actual:.0f}s taken of {planned:.0f}s planned"
+            + (f" ({skips} skipped)" if skips else "")
+            for phase, (planned, actual, skips) in sorted(rests.items())
+        ))
+
+    volume = weekly_volume(weeks=1, user=user)
+    this_week = next(iter(volume.values()), [])
+    if this_week:
+        st.markdown("**This week**")
+        st.table([
+            {"Exercise": ex, "Intervals": intervals, "Work (min)": round(work / 60, 1), "Sets": sets, "Skipped": skips}
+            for ex, intervals, work, sets, skips in this_week
+        ])
+
 def advance_day():
     cfg = st.session_state.config
-    current_day = cfg.get("current_program_day", 1)
-    next_day = current_day + 1
-    if next_day > 9:
-        next_day = 1
+    program = program_for(cfg)
+    next_day, wrapped = next_position(program, position_for(cfg, program))
+    if wrapped:
         st.balloons()
         st.toast("Regime completed! Starting over.")
-    cfg["current_program_day"] = next_day
-    save_config(cfg)
+    save_position(cfg, program, next_day, st.session_state.user_id)
+    # The next day may be a different mode; nothing from this workout carries over,
+    # including a checkpoint that would pull the next session back into it
+    for kind in ("hiit", "strength"):
+        clear_checkpoint(kind, st.session_state.user_id)
+        drop_workout_state(kind)
     st.rerun()
 
 def main():
+    if st.session_state.get("class_mode") or "class" in st.query_params:
+        # Joined by link (?class=CODE) or from the dashboard; loaded only when used
+        import class_mode
+        st.session_state.class_mode = True
+        track()
+        return class_mode.main()
+
     init_app_state()
+    track(active=today_info().type if st.session_state.active_workout else None)
     
     if st.session_state.active_workout:
-        day_info = PROGRAM_DAYS[st.session_state.config["current_program_day"]]
+        day_info = today_info()
         
-        if day_info['type'] == 'strength':
+        if day_info.type == 'strength':
             # Add Back to Dashboard button in sidebar for strength mode
             with st.sidebar:
                 if st.button("⬅️ Back to Dashboard"):
+                    # The checkpoint keeps the place; the in-memory copy goes
+                    drop_workout_state("strength")
                     st.session_state.active_workout = False
                     st.rerun()
             
-            status = strength.show_strength_screen(day_info['sequence'])
+            # Workout screens (and the catalog they read) load on first use, not on the dashboard path
+            import strength_mode as strength
+            status = strength.show_strength_screen(day_info.sequence)
             if status == "complete":
                 st.session_state.active_workout = False
                 advance_day()
-        elif day_info['type'] == 'hiit':
+        elif day_info.type == 'hiit':
             # Integrate HIIT logic
-            st.session_state.selected_sequence = day_info['sequence']
+            st.session_state.selected_sequence = day_info.sequence
             
             # Allow manual return if needed
             with st.sidebar:
                 if st.button("⬅️ Back to Dashboard"):
+                    clear_checkpoint("hiit", st.session_state.user_id)
+                    drop_workout_state("hiit")
                     st.session_state.active_workout = False
                     st.session_state.workout_started = False
                     st.rerun()
                     
+            import pyramid_hiit_streamlit as hiit
             status = hiit.main()
             
             if status == "complete":
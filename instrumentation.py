@@ -0,0 +1,201 @@
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+
+# ---------------------------
+# Opt-in hot-path metrics
+# ---------------------------
+#   HIIT_METRICS=1                  turn recording on (off: every hook is a no-op)
+#   HIIT_METRICS_FILE=path          Prometheus text file, flushed every HIIT_METRICS_INTERVAL s
+#   HIIT_METRICS_PORT=9464          also serve it at http://127.0.0.1:<port>/metrics
+ENABLED = os.environ.get("HIIT_METRICS", "") not in ("", "0")
+METRICS_FILE = Path(os.environ.get("HIIT_METRICS_FILE", ".cache/metrics.prom"))
+FLUSH_INTERVAL = float(os.environ.get("HIIT_METRICS_INTERVAL", "10"))
+METRICS_PORT = int(os.environ.get("HIIT_METRICS_PORT", "0"))
+
+# Seconds; wide enough for a CSS push (~ms) up to a late tick (~s)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+HISTOGRAMS = {
+    "latency": "hiit_latency_seconds",
+    "tick_lateness": "hiit_tick_lateness_seconds",
+}
+COUNTERS = {
+    "reruns": "hiit_reruns_total",
+    "session_evictions": "hiit_session_evictions_total",
+}
+GAUGES = {
+    "sessions": "hiit_sessions",
+    "session_state_bytes": "hiit_session_state_bytes",
+    "session_state_max_bytes": "hiit_session_state_max_bytes",
+}
+
+_lock = threading.Lock()
+_local = threading.local()
+_histograms = {}   # (metric, labels) -> [bucket counts..., +Inf count, sum]
+_counters = {}     # (metric, labels) -> count
+_gauges = {}       # (metric, labels) -> value
+_started = False
+
+# Streamlit runs each session's script in its own thread, so labels bound at
+# the top of a run apply to everything recorded during that run.
+def bind(**labels):
+    if ENABLED:
+        _local.labels = {**getattr(_local, "labels", {}), **{k: str(v) for k, v in labels.items()}}
+
+def _key(metric, labels):
+    merged = {**getattr(_local, "labels", {}), **labels}
+    return metric, tuple(sorted(merged.items()))
+
+def observe(kind, seconds, **labels):
+    if not ENABLED:
+        return
+    _ensure_exporters()
+    key = _key(HISTOGRAMS[kind], labels)
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                h[i] += 1
+                break
+        else:
+            h[len(BUCKETS)] += 1
+        h[-1] += seconds
+
+def count(kind, **labels):
+    if not ENABLED:
+        return
+    _ensure_exporters()
+    key = _key(COUNTERS[kind], labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + 1
+
+def gauge(kind, value, **labels):
+    # Process-wide values: the labels bound to the current run are not applied
+    if not ENABLED:
+        return
+    _ensure_exporters()
+    with _lock:
+        _gauges[GAUGES[kind], tuple(sorted(labels.items()))] = value
+
+@contextmanager
+def span(name, **labels):
+    if not ENABLED:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("latency", time.perf_counter() - started, name=name, **labels)
+
+def timed(name):
+    # Decorator form of span(); returns the function untouched when metrics are off
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+# ---------------------------
+# Export
+# ---------------------------
+def _labels_text(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+def render():
+    with _lock:
+        histograms = {k: list(v) for k, v in _histograms.items()}
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+    lines = []
+    for metric in sorted({m for m, _ in histograms}):
+        lines.append(f"# TYPE {metric} histogram")
+        for (m, labels), h in sorted(histograms.items()):
+            if m != metric:
+                continue
+            running = 0
+            for bound, n in zip(BUCKETS, h):
+                running += n
+                lines.append(f"{metric}_bucket{_labels_text(labels, [('le', bound)])} {running}")
+            running += h[len(BUCKETS)]
+            lines.append(f"{metric}_bucket{_labels_text(labels, [('le', '+Inf')])} {running}")
+            lines.append(f"{metric}_sum{_labels_text(labels)} {h[-1]:.6f}")
+            lines.append(f"{metric}_count{_labels_text(labels)} {running}")
+    for metric in sorted({m for m, _ in counters}):
+        lines.append(f"# TYPE {metric} counter")
+        for (m, labels), n in sorted(counters.items()):
+            if m == metric:
+                lines.append(f"{metric}{_labels_text(labels)} {n}")
+    for metric in sorted({m for m, _ in gauges}):
+        lines.append(f"# TYPE {metric} gauge")
+        for (m, labels), value in sorted(gauges.items()):
+            if m == metric:
+                lines.append(f"{metric}{_labels_text(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+def flush():
+    METRICS_FILE.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=METRICS_FILE.parent, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        f.write(render())
+    os.replace(tmp, METRICS_FILE)
+
+def _flush_loop():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        try:
+            flush()
+        except OSError:
+            pass
+
+def _serve(port):
+    # http.server is imported only when the endpoint is wanted; the terminal timer never pays for it
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+
+def _ensure_exporters():
+    # Started on first use, once per process
+    global _started
+    if _started:
+        return
+    with _lock:
+        if _started:
+            return
+        _started = True
+    threading.Thread(target=_flush_loop, name="hiit-metrics-flush", daemon=True).start()
+    if METRICS_PORT:
+        try:
+            server = _serve(METRICS_PORT)
+        except OSError:
+            # Another process (or a script reload) already holds the port
+            return
+        threading.Thread(target=server.serve_forever, name="hiit-metrics-http", daemon=True).start()
@@ -0,0 +1,53 @@
+import time
+
+# ---------------------------
+# Drift-free phase ticks
+# ---------------------------
+# Every tick is anchored to an absolute time.monotonic() deadline, so render
+# latency never accumulates. Ticks the caller was too slow to take are dropped
+# rather than fired back-to-back.
+class PhaseScheduler:
+    def __init__(self, duration, start=None, clock=None, sleep=None):
+        self.clock = clock or time.monotonic
+        self.sleep = sleep or time.sleep
+        self.duration = duration
+        self.start = self.clock() if start is None else start
+        self.deadline = self.start + duration
+        self.ticks_taken = 0
+        self.dropped = 0
+        self.lateness = 0.0
+        self.max_lateness = 0.0
+        self.drift = 0.0
+
+    def ticks(self):
+        # Yields the whole seconds remaining, e.g. 30, 29, ... 1
+        tick = 0
+        while tick < self.duration:
+            now = self.clock()
+            due = int(now - self.start)
+            if due >= self.duration:
+                break
+            if due > tick:
+                self.dropped += due - tick
+                tick = due
+            self.lateness = now - (self.start + tick)
+            self.max_lateness = max(self.max_lateness, self.lateness)
+            self.ticks_taken += 1
+            yield self.duration - tick
+            tick += 1
+            self._sleep_until(self.start + tick)
+        self.drift = self.clock() - self.deadline
+
+    def _sleep_until(self, target):
+        delay = target - self.clock()
+        if delay > 0:
+            self.sleep(delay)
+
+    def report(self):
+        return {
+            "duration": self.duration,
+            "ticks": self.ticks_taken,
+            "dropped": self.dropped,
+            "max_lateness": round(self.max_lateness, 4),
+            "drift": round(self.drift, 4),
+        }
@@ -0,0 +1,234 @@
+# Local load generator: starts the HIIT page under `streamlit run`, connects N
+# simulated browser sessions over its websocket, starts staggered server-tick
+# workouts and reports tick jitter, phase-transition latency, CPU and RSS.
+#
+#   python load_test.py --sessions 1 5 10 20 40 --duration 120 --out capacity.json
+import argparse
+import asyncio
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+from state_store import clear_checkpoint, save_user_state, scratch_db
+
+APP = "pyramid_hiit_streamlit.py"
+START_LABEL = "🚀 START WORKOUT"
+TICK = re.compile(r"big-timer[^'\"]*['\"]>(\d+)<")
+# Shortest settings the setup screen's number inputs accept
+FAST_SETTINGS = {
+    "work_time": 15,
+    "rest_between_exercises": 5,
+    "rest_between_rounds": 10,
+    "peak_rest": 30,
+    "timer_mode": "server",
+}
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(p / 100 * len(values)))], 4)
+
+# ---------------------------
+# Server under test
+# ---------------------------
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(port, app=APP):
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", app, "--server.headless", "true",
+         "--server.port", str(port), "--browser.gatherUsageStats", "false"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as r:
+                if r.status == 200:
+                    return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("streamlit server did not come up")
+
+class ProcSampler:
+    # CPU and RSS of one process from /proc (Linux)
+    def __init__(self, pid):
+        self.pid = pid
+        self.hz = os.sysconf("SC_CLK_TCK")
+        self.cpu = []
+        self.rss = []
+        self._last = None
+
+    def sample(self):
+        try:
+            with open(f"/proc/{self.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            with open(f"/proc/{self.pid}/status") as f:
+                rss_kb = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+        except (OSError, StopIteration):
+            return
+        ticks = int(fields[11]) + int(fields[12])
+        now = time.monotonic()
+        if self._last:
+            ticks0, now0 = self._last
+            self.cpu.append(100.0 * (ticks - ticks0) / self.hz / (now - now0))
+        self._last = (ticks, now)
+        self.rss.append(rss_kb / 1024)
+
+    async def run(self, stop):
+        while not stop.is_set():
+            self.sample()
+            await asyncio.sleep(1.0)
+
+# ---------------------------
+# Simulated browser session
+# ---------------------------
+class Session:
+    def __init__(self, url, user):
+        self.url = url
+        self.user = user
+        self.ticks = []        # (arrival, run, seconds shown)
+        self.runs = 0
+        self.errors = []
+
+    def rerun(self, trigger=None):
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+
+        msg = BackMsg()
+        msg.rerun_script.query_string = f"user={self.user}"
+        if trigger:
+            msg.rerun_script.widget_states.widgets.add(id=trigger, trigger_value=True)
+        return msg.SerializeToString()
+
+    async def run(self, delay, duration):
+        import websockets
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        await asyncio.sleep(delay)
+        ws = await websockets.connect(self.url, subprotocols=["streamlit"], max_size=None)
+        await ws.send(self.rerun())
+        started = False
+        deadline = time.monotonic() + duration
+        try:
+            while time.monotonic() < deadline:
+                try:
+                    raw = await asyncio.wait_for(ws.recv(), deadline - time.monotonic())
+                except asyncio.TimeoutError:
+                    break
+                except websockets.ConnectionClosed:
+                    self.errors.append("connection closed")
+                    break
+                arrival = time.monotonic()
+                msg = ForwardMsg()
+                msg.ParseFromString(raw)
+                kind = msg.WhichOneof("type")
+                if kind == "new_session":
+                    self.runs += 1
+                elif kind == "session_event" and msg.session_event.WhichOneof("type") == "script_compilation_exception":
+                    self.errors.append("script error")
+                elif kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                    element = msg.delta.new_element
+                    el_kind = element.WhichOneof("type")
+                    if el_kind == "button" and element.button.label == START_LABEL and not started:
+                        started = True
+                        await ws.send(self.rerun(trigger=element.button.id))
+                    elif el_kind == "markdown":
+                        m = TICK.search(element.markdown.body)
+                        if m:
+                            self.ticks.append((arrival, self.runs, int(m.group(1))))
+                    elif el_kind == "exception":
+                        self.errors.append(element.exception.message)
+        finally:
+            await ws.close()
+
+    def metrics(self):
+        jitter, transitions = [], []
+        for (t0, run0, s0), (t1, run1, s1) in zip(self.ticks, self.ticks[1:]):
+            if run0 == run1 and s1 == s0 - 1:
+                jitter.append(abs((t1 - t0) - 1.0))
+            elif run1 != run0 or s1 >= s0:
+                # Next phase (new script/fragment run or the countdown restarting). Tick `s0`
+                # was shown with s0 seconds left, so the phase ended at t0 + s0
+                transitions.append(t1 - (t0 + s0))
+        return jitter, transitions
+
+# ---------------------------
+# Load levels
+# ---------------------------
+async def run_level(n, port, pid, stagger, duration):
+    url = f"ws://127.0.0.1:{port}/_stcore/stream"
+    sessions = []
+    for i in range(n):
+        user = f"load-{i}"
+        save_user_state(FAST_SETTINGS, user)
+        clear_checkpoint("hiit", user)
+        sessions.append(Session(url, user))
+    sampler = ProcSampler(pid)
+    stop = asyncio.Event()
+    sampling = asyncio.ensure_future(sampler.run(stop))
+    await asyncio.gather(*(s.run(i * stagger, duration) for i, s in enumerate(sessions)))
+    stop.set()
+    await sampling
+
+    jitter, transitions = [], []
+    for s in sessions:
+        j, t = s.metrics()
+        jitter += j
+        transitions += t
+    return {
+        "sessions": n,
+        "ticks": len(jitter),
+        "tick_jitter_p50": percentile(jitter, 50),
+        "tick_jitter_p95": percentile(jitter, 95),
+        "tick_jitter_max": percentile(jitter, 100),
+        "transitions": len(transitions),
+        "transition_p50": percentile(transitions, 50),
+        "transition_p95": percentile(transitions, 95),
+        "transition_max": percentile(transitions, 100),
+        "cpu_pct_mean": round(sum(sampler.cpu) / len(sampler.cpu), 1) if sampler.cpu else None,
+        "cpu_pct_max": round(max(sampler.cpu), 1) if sampler.cpu else None,
+        "rss_mb_max": round(max(sampler.rss), 1) if sampler.rss else None,
+        "errors": sorted({e for s in sessions for e in s.errors}),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Capacity curve for concurrent server-tick workouts.")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 5, 10, 20])
+    parser.add_argument("--duration", type=float, default=120, help="seconds each session is observed")
+    parser.add_argument("--stagger", type=float, default=0.5, help="seconds between session starts")
+    parser.add_argument("--out", default="capacity.json")
+    args = parser.parse_args()
+
+    curve = []
+    # The load users' settings, checkpoints and history go to a throwaway
+    # database, shared with each server through HIIT_STATE_DB
+    with scratch_db():
+        for n in args.sessions:
+            # A fresh server per level so RSS isn't inherited from the previous one
+            port = free_port()
+            proc = start_server(port)
+            try:
+                level = asyncio.run(run_level(n, port, proc.pid, args.stagger, args.duration))
+            finally:
+                proc.terminate()
+                proc.wait(timeout=10)
+            curve.append(level)
+            print(f"{n:4} sessions  jitter p95 {level['tick_jitter_p95']}s  "
+                  f"transition p95 {level['transition_p95']}s  cpu {level['cpu_pct_mean']}%  "
+                  f"rss {level['rss_mb_max']} MB" + (f"  errors: {level['errors']}" if level["errors"] else ""))
+
+    with open(args.out, "w") as f:
+        json.dump({"version": 1, "app": APP, "settings": FAST_SETTINGS, "duration": args.duration,
+                   "stagger": args.stagger, "curve": curve}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
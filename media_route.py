@@ -0,0 +1,78 @@
+import html
+from functools import lru_cache
+from pathlib import Path
+
+import streamlit as st
+
+from asset_index import file_digest, materialise
+from shared_utils import media_for
+from styles import STATIC_DIR
+
+# Published copies live under static/, which Streamlit serves at app/static/
+MEDIA_DIR = STATIC_DIR / "media"
+MEDIA_URL = "app/static/media"
+# Same breakpoint as the stylesheets' phone layout; those viewports get the small rendition
+NARROW_VIEWPORT = "(max-width: 600px)"
+NARROW_BOX = 200
+
+# ---------------------------
+# Static media route
+# ---------------------------
+# st.image() reads the whole file into the per-session media manager under a fresh
+# URL every run. With static serving on, each file is instead hardlinked once into
+# static/media/ under its content hash and referenced by URL: the server streams it
+# from disk (ETag and Range requests included). Same content, same URL; a changed
+# file gets a new one. Streamlit's route itself only sends ETag/Last-Modified, so
+# browsers revalidate on each visit; run through serve.py, the ?v= fingerprint gets
+# an immutable year-long Cache-Control and a browser fetches each GIF only once.
+def static_media_enabled():
+    return bool(st.get_option("server.enableStaticServing"))
+
+def media_url(path):
+    src = Path(path)
+    try:
+        stat = src.stat()
+    except OSError:
+        return None
+    return _publish(src.as_posix(), stat.st_size, stat.st_mtime_ns)
+
+@lru_cache(maxsize=1024)
+def _publish(path, size, mtime_ns):
+    # size/mtime_ns only key the memo: an edited file is re-hashed and re-published
+    digest = file_digest(path)[:16]
+    name = f"{digest}{Path(path).suffix.lower()}"
+    materialise(path, MEDIA_DIR / name)
+    return f"{MEDIA_URL}/{name}?v={digest}"
+
+def image_tag(url, width=None, use_container_width=False):
+    size = " style='width:100%'" if use_container_width else f" width='{int(width)}'" if width else ""
+    return f"<img src='{html.escape(url, quote=True)}'{size}>"
+
+def show_image(path, target=None, width=None, use_container_width=False):
+    # Drop-in for target.image(path, ...) at the image call sites
+    target = target or st
+    url = media_url(path) if static_media_enabled() else None
+    if url is None:
+        return target.image(path, width=width, use_container_width=use_container_width)
+    return target.markdown(image_tag(url, width, use_container_width), unsafe_allow_html=True)
+
+# ---------------------------
+# Responsive exercise media
+# ---------------------------
+# Takes the catalog path rather than a resolved file. With the static route, a
+# <picture> lets phones fetch the 200 px rendition and everything else the 400 px
+# one; the browser downloads only the source that matches. Without it st.image
+# can only send one file, so everyone gets the 400 px rendition.
+def picture_tag(url, narrow_url, width=None, use_container_width=False):
+    source = f"<source media='{NARROW_VIEWPORT}' srcset='{html.escape(narrow_url, quote=True)}'>"
+    return f"<picture>{source}{image_tag(url, width, use_container_width)}</picture>"
+
+def show_media(image, target=None, width=None, use_container_width=False):
+    path = media_for(image)
+    url = media_url(path) if static_media_enabled() else None
+    if url is None:
+        return show_image(path, target, width, use_container_width)
+    narrow_url = media_url(media_for(image, box=NARROW_BOX))
+    tag = picture_tag(url, narrow_url, width, use_container_width) if narrow_url and narrow_url != url \
+        else image_tag(url, width, use_container_width)
+    return (target or st).markdown(tag, unsafe_allow_html=True)
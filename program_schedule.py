@@ -0,0 +1,129 @@
+import datetime
+import json
+import logging
+import os
+import tempfile
+from collections import namedtuple
+from functools import lru_cache
+from pathlib import Path
+
+from shared_utils import CATALOG_PATH, load_catalog
+from state_store import DEFAULT_USER, save_user_state
+
+DAY_TYPES = ("strength", "hiit", "rest")
+CALENDAR_DAYS = 28
+# Compiled programs only, keyed by the catalog's mtime; the dashboard reads this
+# instead of parsing the whole catalog on a cold start
+SUMMARY_PATH = Path(".cache/program_summary.json")
+
+log = logging.getLogger(__name__)
+
+# ---------------------------
+# Programs from the catalog
+# ---------------------------
+# "programs": {name: [{"name", "type", "sequence"?}, ...]} in hiit_config.json.
+# Day numbers are 1-based positions in the cycle; the cycle length is the list length.
+ProgramDay = namedtuple("ProgramDay", ["number", "name", "type", "sequence"])
+Program = namedtuple("Program", ["name", "days"])
+
+def compile_programs(catalog):
+    sequences = catalog.get("exercise_sequences", {})
+    programs = {}
+    for name, days in catalog.get("programs", {}).items():
+        compiled = []
+        for number, day in enumerate(days, start=1):
+            kind = day.get("type", "rest")
+            sequence = day.get("sequence")
+            if kind not in DAY_TYPES:
+                log.warning("program %s: day %d has unknown type %r, treating it as rest", name, number, kind)
+                kind, sequence = "rest", None
+            elif kind != "rest" and sequence not in sequences:
+                log.warning("program %s: day %d uses unknown sequence %r, treating it as rest", name, number, sequence)
+                kind, sequence = "rest", None
+            compiled.append(ProgramDay(number, day.get("name", f"Day {number}"), kind, sequence))
+        if not compiled:
+            log.warning("program %s has no days, skipping it", name)
+            continue
+        programs[name] = Program(name, tuple(compiled))
+    return programs
+
+_programs = (None, None)
+
+def load_programs():
+    # Recompiled only when the catalog file changes (i.e. on hot reload)
+    global _programs
+    try:
+        mtime = CATALOG_PATH.stat().st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    if _programs[0] != mtime or _programs[1] is None:
+        programs = _read_summary(mtime)
+        if programs is None:
+            programs = compile_programs(load_catalog())
+            _write_summary(mtime, programs)
+        _programs = (mtime, programs)
+    return _programs[1]
+
+def _read_summary(mtime):
+    try:
+        with open(SUMMARY_PATH, "r") as f:
+            summary = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if mtime is None or summary.get("catalog_mtime_ns") != mtime:
+        return None
+    return {
+        name: Program(name, tuple(ProgramDay(*day) for day in days))
+        for name, days in summary["programs"].items()
+    }
+
+def _write_summary(mtime, programs):
+    if mtime is None:
+        return
+    try:
+        SUMMARY_PATH.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=SUMMARY_PATH.parent, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"catalog_mtime_ns": mtime,
+                       "programs": {name: program.days for name, program in programs.items()}}, f)
+        os.replace(tmp, SUMMARY_PATH)
+    except OSError:
+        # Read-only checkout: the summary is only a startup shortcut
+        pass
+
+def program_for(cfg):
+    # The user's chosen program, falling back to the first one in the catalog
+    programs = load_programs()
+    return programs.get(cfg.get("current_program")) or next(iter(programs.values()))
+
+# ---------------------------
+# Position and calendar
+# ---------------------------
+def position_for(cfg, program):
+    # Clamped into the cycle, so a shorter program or a stale saved day still lands on a real entry
+    day = cfg.get("current_program_day", 1)
+    return day if 1 <= day <= len(program.days) else 1
+
+def day_info(program, position):
+    return program.days[position - 1]
+
+def next_position(program, position):
+    # (next day, wrapped) — wrapped is True when the cycle starts over
+    if position >= len(program.days):
+        return 1, True
+    return position + 1, False
+
+@lru_cache(maxsize=16)
+def upcoming_calendar(program, position, start, days=CALENDAR_DAYS):
+    # {date: ProgramDay} from `start` (today's entry) for `days` days; dashboard lookups are dict hits
+    cycle = len(program.days)
+    return {
+        start + datetime.timedelta(days=offset): program.days[(position - 1 + offset) % cycle]
+        for offset in range(days)
+    }
+
+def save_position(cfg, program, position, user=DEFAULT_USER):
+    # Writes only the user's place in the program, never the rest of the overrides
+    cfg["current_program"] = program.name
+    cfg["current_program_day"] = position
+    return save_user_state({"current_program": program.name, "current_program_day": position}, user)
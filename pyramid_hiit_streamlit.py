@@ -1,18 +1,40 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import time
-import json
-import random
 from pathlib import Path
-from shared_utils import STRETCHING_GIFS, load_config, save_config, calculate_total_time, format_time
+import instrumentation as metrics
+from styles import use_stylesheet
+from media_route import show_image, show_media
+from session_gc import drop_workout_state, track
+from shared_utils import DEFAULT_USER, STRETCH_TARGETS, load_config, save_config, format_time, missing_media
+from interval_scheduler import PhaseScheduler
+from state_store import clear_checkpoint, resumable_checkpoint, save_checkpoint
+from workout_history import record_interval, record_workout
+from thumbnail_cache import thumbnail_for
+from workout_patterns import DEFAULT_FORMATS, plan_for_format, plan_timing
+from workout_timeline import compile_timeline, progress_fraction, upcoming_media, interval_at, rest_playlist, stretch_at
+
+TIMING_KEYS = ("work_time", "rest_between_exercises", "rest_between_rounds", "peak_rest")
+
+# Browser-side countdown: the server sends one phase, the browser ticks and
+# reports back only when the phase ends.
+countdown_timer = components.declare_component(
+    "countdown_timer", path=str(Path(__file__).parent / "countdown_component")
+)
 
 # ---------------------------
 # Session state defaults
 # ---------------------------
 def init_hiit_session():
+    if "user_id" not in st.session_state:
+        st.session_state.user_id = st.query_params.get("user", DEFAULT_USER)
     if "config" not in st.session_state:
-        st.session_state.config = load_config()
+        st.session_state.config = load_config(st.session_state.user_id)
+    if "workout_format" not in st.session_state:
+        st.session_state.workout_format = st.session_state.config.get("workout_format", "Pyramid")
     if "workout_started" not in st.session_state:
-        st.session_state.workout_started = False
+        # A fresh session (reconnect, restart) picks up an unfinished workout
+        st.session_state.workout_started = resume_hiit_workout(st.session_state.config)
     if "round" not in st.session_state:
         st.session_state.round = 1
     if "exercise_index" not in st.session_state:
@@ -23,187 +45,42 @@ def init_hiit_session():
         st.session_state.total_time_seconds = 0
     if "elapsed_time_seconds" not in st.session_state:
         st.session_state.elapsed_time_seconds = 0
+    if "workout_id" not in st.session_state:
+        st.session_state.workout_id = time.time_ns()
+    if "metrics_session" not in st.session_state:
+        st.session_state.metrics_session = f"{time.time_ns():x}"[-8:]
+    metrics.bind(session=st.session_state.metrics_session)
     
 # ---------------------------
-# Styles
+# Workout formats
 # ---------------------------
-def inject_hiit_css():
-    st.markdown("""
-    <style>
-    /* Sidebar Transparency (40%) */
-    [data-testid="stSidebar"] {
-        background-color: rgba(220, 220, 220, 0.95); 
-        color: black !important;
-    }
-    [data-testid="stSidebar"] [data-testid="stMarkdownContainer"] p, 
-    [data-testid="stSidebar"] [data-testid="stMarkdownContainer"] span,
-    [data-testid="stSidebar"] [data-testid="stMarkdownContainer"] li {
-        color: black !important;
-    }
-    [data-testid="stSidebar"] h1, [data-testid="stSidebar"] h2, [data-testid="stSidebar"] h3 {
-        color: black !important;
-    }
-
-    .top-timer {
-        position: sticky;
-        top: 0;
-        z-index: 999;
-        background-color: #fff;
-        border-bottom: 2px solid #ddd;
-        padding: 2px 4px;
-    }
-
-    /* Default styles for larger screens (compact layout) */
-    .big-timer {
-        font-size: 80px;
-        font-weight: bold;
-        text-align: center;
-        padding: 20px; 
-        border-radius: 15px;
-        margin: 10px 0;
-        height: 300px;
-        display: flex;
-        align-items: center;
-        justify-content: center;
-    }
-    .exercise-name {
-        font-size: 36px;
-        font-weight: bold;
-        text-align: center;
-        margin-bottom: 5px;
-    }
-    /* Standardize image height in workout screen */
-    [data-testid="stColumn"]:nth-of-type(1) img {
-        max-height: 400px !important;
-        width: auto !important;
-        object-fit: contain !important;
-        margin-left: auto;
-        margin-right: auto;
-        display: block;
-    }
-    .gif-blank { height: 400px; }
-
-    /* Mobile-Specific Styles: Shrink everything for screens <= 600px */
-    @media (max-width: 600px) {
-        .big-timer {
-            font-size: 50px; 
-            height: 150px; 
-        }
-        .exercise-name {
-            font-size: 24px;
-        }
-        .exercise-gif { 
-            max-height: 200px; 
-        }
-        .gif-blank {
-            height: 200px; 
-        }
-    }
-
-    /* Color and general styles */
-    .work-phase {
-        background: linear-gradient(135deg, #10b981, #059669);
-        color: white;
-    }
-    .rest-phase {
-        background: linear-gradient(135deg, #f59e0b, #d97706);
-        color: white;
-    }
-    .phase-labels {
-        text-align: center;
-        font-size: 20px;
-        font-weight: bold;
-        margin: 5px 0 15px 0;
-    }
-    .label-active { opacity: 1;   transition: opacity 0.4s ease; }
-    .label-faded  { opacity: 0.2; transition: opacity 0.4s ease; }
-
-    .pyramid-progress {
-        text-align: center;
-        font-size: 11px;
-        margin-top: 5px;
-        padding: 8px;
-        background-color: #ffffff;
-        border: 1px solid #e0e0e0;
-        border-radius: 8px;
-        display: flex;
-        flex-wrap: wrap;
-        justify-content: center;
-        gap: 4px;
-    }
-    .round-item { 
-        padding: 4px 6px; 
-        border-radius: 4px;
-        min-width: 25px;
-        text-align: center;
-    }
-    .round-completed { 
-        background-color: #e5e7eb;
-        color: #9ca3af;
-    }
-    .round-current   { 
-        background-color: #10b981; 
-        color: white; 
-        font-weight: bold;
-        box-shadow: 0 2px 4px rgba(16, 185, 129, 0.3);
-    }
-    .round-upcoming  { 
-        background-color: #f3f4f6;
-        color: #6b7280; 
-    }
-                
-    /* Remove Streamlit’s default top divider / padding */
-    section.main > div:first-child {
-        border-top: none !important;
-        margin-top: 0 !important;
-        padding-top: 0 !important;
-    }
-    [data-testid="stAppViewBlockContainer"] {
-        border-top: none !important;
-        box-shadow: none !important;
-    }
-
-    /* Small thumbnails in setup view */
-    img {
-        border-radius: 6px;
-    }
-
-    /* Invisible button overlay for skipping */
-    .skip-btn-container {
-        position: relative;
-        width: 100%;
-    }
-    .skip-btn-container button {
-        position: absolute !important;
-        top: 0;
-        left: 0;
-        width: 100% !important;
-        height: 100% !important;
-        opacity: 0 !important;
-        z-index: 1000 !important;
-        border: none !important;
-        cursor: pointer;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+# Formats are catalog data ("workout_formats"); the round plan for a format and
+# sequence length is generated once and memoized in workout_patterns.
+def workout_formats(cfg):
+    return cfg.get("workout_formats") or DEFAULT_FORMATS
+
+def workout_plan(cfg, exercises, name=None):
+    formats = workout_formats(cfg)
+    fmt = formats.get(name or st.session_state.workout_format) or next(iter(formats.values()))
+    return plan_for_format(fmt, len(exercises))
+
+def workout_playlist(timeline):
+    # Seeded by the workout id, so a resumed workout gets the same rest media
+    muscles = st.session_state.config.get("exercise_muscles", {})
+    return rest_playlist(timeline, st.session_state.workout_id, STRETCH_TARGETS, muscles)
 
 # ---------------------------
-# Pyramid order helpers (UNCHANGED)
+# Styles
 # ---------------------------
-PYRAMID_LABELS = ["1", "1-2", "1-2-3", "1-2-3-4", "1-2-3-4-5", "5-4-3-2", "5-4-3", "5-4", "5"]
-PYRAMID_INDICES = [
-    [1], [1,2], [1,2,3], [1,2,3,4], [1,2,3,4,5], 
-    [5,4,3,2], [5,4,3], [5,4], [5],
-]
-
-def round_exercises(round_num, full_list):
-    idxs = PYRAMID_INDICES[round_num - 1]
-    return [full_list[i-1] for i in idxs]
+@metrics.timed("inject_hiit_css")
+def inject_hiit_css():
+    use_stylesheet("hiit")
 
 # ---------------------------
 # UI screens
 # ---------------------------
 def show_setup_screen():
+    metrics.bind(phase="setup")
     inject_hiit_css()
     st.title("🔥 Pyramid HIIT Timer")
     st.markdown("### Configure Your Workout")
@@ -226,36 +103,74 @@ def show_setup_screen():
 
         # Visual layout for thumbnails
         st.markdown("### Exercises Preview")
+        animate = st.toggle("Animated previews", value=False)
         cols = st.columns(len(exercises))
 
         for i, ex in enumerate(exercises):
             img_url = images.get(ex)
             with cols[i]:
                 if img_url:
-                    st.image(img_url, use_container_width=True)
+                    show_image(thumbnail_for(img_url, width=200, animated=animate), use_container_width=True)
                 st.markdown(f"<div style='text-align:center; font-size:12px;'>{ex}</div>", unsafe_allow_html=True)
+        # Surface broken media here rather than as a blank box mid-workout
+        missing = missing_media(st.session_state.config, exercises)
+        if missing:
+            st.error("Missing media: " + ", ".join(f"{ex} ({path or 'no image set'})" for ex, path in missing))
         st.markdown("---")
-        st.info("Pyramid: 1 → 1-2 → 1-2-3 → 1-2-3-4 → 1-2-3-4-5 → 5-4-3-2 → 5-4-3 → 5-4 → 5")
+        cfg = st.session_state.config
+        formats = list(workout_formats(cfg))
+        fmt = st.selectbox(
+            "Workout format:", formats,
+            index=formats.index(st.session_state.workout_format) if st.session_state.workout_format in formats else 0,
+        )
+        st.session_state.workout_format = cfg["workout_format"] = fmt
+        try:
+            plan = workout_plan(cfg, exercises, fmt)
+        except ValueError as e:
+            st.error(f"Workout format {fmt!r}: {e}")
+            plan = None
+        if plan:
+            st.info(f"{fmt}: " + " → ".join(plan.labels))
 
     with c2:
-        cfg = st.session_state.config
         cfg["work_time"] = st.number_input("Work (s)", 15, 120, cfg["work_time"], step=5)
         cfg["rest_between_exercises"] = st.number_input("Rest Between Exercises (s)", 5, 60, cfg["rest_between_exercises"], step=5)
         cfg["rest_between_rounds"] = st.number_input("Rest Between Rounds (s)", 10, 120, cfg["rest_between_rounds"], step=5)
         cfg["peak_rest"] = st.number_input("Peak Rest (s)", 30, 180, cfg["peak_rest"], step=5)
+        timer_modes = {"client": "Browser countdown", "server": "Server ticks"}
+        cfg["timer_mode"] = st.radio(
+            "Timer",
+            options=list(timer_modes.keys()),
+            format_func=lambda x: timer_modes[x],
+            index=list(timer_modes.keys()).index(cfg.get("timer_mode", "server")),
+            horizontal=True
+        )
+        try:
+            timing = plan_timing(plan, cfg) if plan else None
+        except ValueError as e:
+            # e.g. an EMOM whose work time leaves no rest in the minute
+            st.error(f"Workout format {fmt!r}: {e}")
+            plan = None
+        if plan and (plan.timing or plan.round_seconds or plan.time_cap):
+            st.caption(f"{fmt} sets its own timing: {timing['work_time']}s work, "
+                       f"{timing['rest_between_exercises']}s / {timing['rest_between_rounds']}s rest")
 
     st.markdown("---")
     
-    if st.button("🚀 START WORKOUT", type="primary"):
+    if st.button("🚀 START WORKOUT", type="primary", disabled=plan is None):
         st.session_state.workout_started = True
-        st.session_state.round = 1
-        st.session_state.exercise_index = 0
-        st.session_state.elapsed_time_seconds = 0
+        st.session_state.interval_index = 0
+        st.session_state.workout_id = time.time_ns()
+        st.session_state.workout_anchor = None
         
-        # Calculate and store total time
-        st.session_state.total_time_seconds = calculate_total_time(cfg) 
+        # Compile every interval up front and store the total time
+        st.session_state.timeline = compile_timeline(exercises, cfg, images, plan)
+        st.session_state.total_time_seconds = st.session_state.timeline.total
+        st.session_state.rest_playlist = workout_playlist(st.session_state.timeline)
+        sync_interval_state(st.session_state.timeline)
+        checkpoint_phase()
         
-        save_config(st.session_state.config)
+        save_config(st.session_state.config, st.session_state.user_id)
         # RERUN is called, but the function still finishes, 
         # which can cause rendering issues. We rely on the main function 
         # logic below to block further setup rendering.
@@ -263,25 +178,178 @@ def show_setup_screen():
         st.stop
         return 
 
-def show_pyramid_progress():
+# Mirrors the current interval into the session keys the rest of the app reads
+def sync_interval_state(timeline):
+    idx = st.session_state.interval_index
+    if idx >= len(timeline.intervals):
+        st.session_state.workout_phase = "complete"
+        st.session_state.elapsed_time_seconds = timeline.total
+        return None
+    interval = timeline.intervals[idx]
+    st.session_state.workout_phase = interval.phase
+    st.session_state.round = interval.round
+    st.session_state.exercise_index = interval.exercise_index
+    st.session_state.elapsed_time_seconds = interval.start
+    return interval
+
+# ---------------------------
+# Checkpoint and resume
+# ---------------------------
+# Written at every phase boundary: enough to recompile the same timeline and
+# to work out, from wall-clock time, where the workout would be now.
+def checkpoint_phase():
+    cfg = st.session_state.config
+    st.session_state.phase_started_at = time.time()
+    save_checkpoint("hiit", {
+        "sequence": st.session_state.selected_sequence,
+        "format": st.session_state.workout_format,
+        "workout_id": st.session_state.workout_id,
+        "interval_index": st.session_state.interval_index,
+        "started_at": st.session_state.phase_started_at,
+        "timing": {k: cfg[k] for k in TIMING_KEYS if k in cfg},
+    }, st.session_state.user_id)
+
+def resume_hiit_workout(cfg):
+    saved = resumable_checkpoint("hiit", st.session_state.user_id)
+    if not saved:
+        return False
+    state = saved[0]
+    exercises = cfg["exercise_sequences"].get(state["sequence"])
+    if exercises is None:
+        clear_checkpoint("hiit", st.session_state.user_id)
+        return False
+
+    try:
+        plan = workout_plan(cfg, exercises, state.get("format"))
+        timeline = compile_timeline(exercises, state["timing"], cfg["exercise_images"], plan)
+    except ValueError:
+        clear_checkpoint("hiit", st.session_state.user_id)
+        return False
+    index = min(state["interval_index"], len(timeline.intervals) - 1)
+    elapsed = timeline.intervals[index].start + max(0.0, time.time() - state["started_at"])
+    if elapsed >= timeline.total:
+        clear_checkpoint("hiit", st.session_state.user_id)
+        return False
+
+    current = interval_at(timeline, elapsed)
+    st.session_state.selected_sequence = state["sequence"]
+    st.session_state.workout_format = state.get("format", st.session_state.workout_format)
+    st.session_state.workout_id = state["workout_id"]
+    st.session_state.timeline = timeline
+    st.session_state.total_time_seconds = timeline.total
+    st.session_state.rest_playlist = workout_playlist(timeline)
+    st.session_state.interval_index = current.index
+    # Server ticks continue from the anchor; the browser countdown from resume_at
+    st.session_state.workout_anchor = time.monotonic() - elapsed
+    st.session_state.resume_at = (current.index, elapsed - current.start)
+    st.session_state.phase_started_at = time.time() - (elapsed - current.start)
+    sync_interval_state(timeline)
+    return True
+
+def in_fragment_run():
+    # st.rerun(scope="fragment") is only allowed while a fragment reruns on its own,
+    # not when the fragment body runs as part of a full-page run
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    return bool(ctx and ctx.fragment_ids_this_run)
+
+def advance_phase(timeline):
+    st.session_state.interval_index += 1
+    return sync_interval_state(timeline)
+
+# Ends the current interval. Most transitions only change the stage fragment; the
+# whole page reruns only when the sidebar's view (exercise, round) or the screen changes.
+def end_phase(timeline, interval, skipped=False):
+    user = st.session_state.user_id
+    started = st.session_state.get("phase_started_at")
+    actual = time.time() - started if started else interval.duration
+    record_interval(interval, actual, skipped, st.session_state.workout_id, st.session_state.selected_sequence, user)
+    nxt = advance_phase(timeline)
+    if nxt is None:
+        clear_checkpoint("hiit", user)
+        record_workout("hiit", st.session_state.selected_sequence, st.session_state.workout_id, user)
+    else:
+        checkpoint_phase()
+    if nxt is None or (nxt.exercise, nxt.round) != (interval.exercise, interval.round) or not in_fragment_run():
+        st.rerun()
+    st.rerun(scope="fragment")
+
+def show_pyramid_progress(timeline):
     current = st.session_state.round - 1 
     html = "<div class='pyramid-progress'>"
-    for i, label in enumerate(PYRAMID_LABELS):
+    for i, label in enumerate(timeline.labels):
         cls = "round-current" if i == current else "round-completed" if i < current else "round-upcoming"
         html += f"<span class='round-item {cls}'>{label}</span>"
     html += "</div>"
     st.markdown(html, unsafe_allow_html=True)
 
+# Sidebar — styled to match strength mode
+def show_workout_sidebar(timeline, exercises, interval):
+    current_exercise = interval.exercise if interval else None
+    st.title("🔥 HIIT Workout")
+    st.markdown(f"### {st.session_state.selected_sequence}")
+    for i, ex in enumerate(exercises):
+        if ex == current_exercise:
+            prefix = "➡️ "
+        else:
+            prefix = "⚪ "
+        st.markdown(f"{prefix}{ex}")
+    st.markdown("---")
+    st.markdown(f"### 🧱 {st.session_state.workout_format} Progress")
+    show_pyramid_progress(timeline)
+
 def show_workout_screen():
     inject_hiit_css()
+    # Invisible tap overlay for the exercise image
+    use_stylesheet("hiit_workout")
     cfg = st.session_state.config
     exercises = cfg["exercise_sequences"][st.session_state.selected_sequence]
 
-    if "workout_phase" not in st.session_state:
-        st.session_state.workout_phase = "prepare"
+    if "timeline" not in st.session_state:
+        st.session_state.interval_index = 0
+        st.session_state.timeline = compile_timeline(exercises, cfg, cfg["exercise_images"], workout_plan(cfg, exercises))
+        st.session_state.total_time_seconds = st.session_state.timeline.total
+    if "rest_playlist" not in st.session_state:
+        st.session_state.rest_playlist = workout_playlist(st.session_state.timeline)
+    timeline = st.session_state.timeline
+    interval = sync_interval_state(timeline)
+    metrics.bind(phase=st.session_state.workout_phase)
+
+    with st.sidebar:
+        show_workout_sidebar(timeline, exercises, interval)
+
+    if st.session_state.workout_phase == "complete":
+        st.balloons()
+        st.success("🎉 WORKOUT COMPLETE! Amazing job!")
+        st.markdown(f"### Total Workout Time: **{format_time(timeline.total)}**")
+        st.progress(1.0)
+        if st.session_state.get("timer_drift"):
+            st.caption(f"Timer drift at finish: {st.session_state.timer_drift['drift']:+.2f}s")
+        if st.button("Back to Setup"):
+            clear_checkpoint("hiit", st.session_state.user_id)
+            drop_workout_state("hiit")
+            st.session_state.workout_started = False
+            st.rerun()
+        return "complete"
+
+    workout_stage()
+    return "active"
+
+# Timer, media and progress for the current interval. Fragment reruns skip the
+# dashboard routing, sidebar and stylesheets; they read everything from session state.
+@st.fragment
+def workout_stage():
+    # Looked up at call time so tools like bench_workout.py can wrap the body
+    show_workout_stage()
+
+def show_workout_stage():
+    cfg = st.session_state.config
+    timeline = st.session_state.timeline
+    interval = sync_interval_state(timeline)
+    metrics.bind(phase=st.session_state.workout_phase)
 
     # --- Define all placeholders ---
-    progress_ph = st.empty()
     progress_text = st.empty()
     progress_bar = st.empty()
     labels_ph = st.empty()
@@ -289,197 +357,136 @@ def show_workout_screen():
     gif_col, timer_col = st.columns([2, 1])
     with gif_col:
         gif_ph_name = st.empty()
+        # Invisible tap overlay over the image; one stable key for the whole workout
+        if st.button("Skip", key="skip", use_container_width=True):
+            st.session_state.workout_anchor = None
+            end_phase(timeline, interval, skipped=True)
         gif_ph = st.empty()
     with timer_col:
         timer_ph = st.empty()
-
-    # Determine current exercise
-    curr_list = round_exercises(st.session_state.round, exercises)
-    st.session_state.exercise_index = min(st.session_state.exercise_index, len(curr_list) - 1)
-    current_exercise = curr_list[st.session_state.exercise_index]
-
-    # Sidebar — styled to match strength mode
-    with st.sidebar:
-        st.title("🔥 HIIT Workout")
-        st.markdown(f"### {st.session_state.selected_sequence}")
-        for i, ex in enumerate(exercises):
-            if ex == current_exercise:
-                prefix = "➡️ "
-            else:
-                prefix = "⚪ "
-            st.markdown(f"{prefix}{ex}")
-        st.markdown("---")
-        st.markdown("### 🧱 Pyramid Progress")
-        show_pyramid_progress()
+        prefetch_ph = st.empty()
 
     # Timer values
-    total_time_str = format_time(st.session_state.total_time_seconds)
+    total_time_str = format_time(timeline.total)
     
-    # Helper for rendering interactive image — invisible tap overlay (like strength mode)
+    # Helper for rendering the exercise image under the skip overlay (like strength mode)
     def render_skip_image(img_url, label=None):
-        if label:
-            gif_ph_name.markdown(f"<div class='exercise-name'>{label}</div>", unsafe_allow_html=True)
-        
-        with gif_ph.container():
-            st.markdown("""
-                <style>
-                /* Invisible tap overlay for HIIT image */
-                [data-testid="stColumn"]:nth-of-type(1) button {
-                    position: absolute !important;
-                    height: 400px !important;
-                    width: 100% !important;
-                    opacity: 0 !important;
-                    z-index: 1000 !important;
-                    border: none !important;
-                    cursor: pointer;
-                    top: 0;
-                    left: 0;
-                }
-                </style>
-            """, unsafe_allow_html=True)
-            if st.button("Skip", key=f"skip_{st.session_state.elapsed_time_seconds}", use_container_width=True):
-                st.session_state.skip_triggered = True
-                st.rerun()
+        with metrics.span("render_skip_image"):
+            if label:
+                gif_ph_name.markdown(f"<div class='exercise-name'>{label}</div>", unsafe_allow_html=True)
             if img_url:
-                st.image(img_url, use_container_width=True)
-            else:
-                st.markdown("<div class='gif-blank'></div>", unsafe_allow_html=True)
-
-    # Check for skip from previous run
-    if st.session_state.get("skip_triggered"):
-        st.session_state.skip_triggered = False
-        if st.session_state.workout_phase == "prepare":
-            st.session_state.workout_phase = "work"
-            st.session_state.elapsed_time_seconds = 10
-        elif st.session_state.workout_phase == "work":
-            st.session_state.elapsed_time_seconds += cfg["work_time"]
-            st.session_state.exercise_index += 1
-            if st.session_state.exercise_index < len(curr_list):
-                st.session_state.workout_phase = "rest_exercise"
+                show_media(img_url, gif_ph, use_container_width=True)
             else:
-                st.session_state.workout_phase = "rest_round"
-        elif st.session_state.workout_phase == "rest_exercise":
-            st.session_state.elapsed_time_seconds += cfg["rest_between_exercises"]
-            st.session_state.workout_phase = "work"
-        elif st.session_state.workout_phase == "rest_round":
-            st.session_state.elapsed_time_seconds += (cfg["peak_rest"] if st.session_state.round == 5 else cfg["rest_between_rounds"])
-            st.session_state.round += 1
-            st.session_state.exercise_index = 0
-            if st.session_state.round > 9:
-                st.session_state.workout_phase = "complete"
-            else:
-                st.session_state.workout_phase = "work"
-        st.rerun()
+                gif_ph.markdown("<div class='gif-blank'></div>", unsafe_allow_html=True)
+
+    # Loads the next work GIFs, and the next rest's stretches, into the browser's image cache.
+    # show_media() gives the same URLs, for this viewport's rendition, the next phase will use.
+    def prefetch_upcoming():
+        # The browser countdown shows a rest's first stretch throughout; server ticks swap through every slot
+        slots = 1 if cfg.get("timer_mode", "server") == "client" else None
+        paths = upcoming_media(timeline, interval.index, count=2, playlist=st.session_state.rest_playlist, slots=slots)
+        if not paths:
+            return
+        # Keyed, so prefetch.css can hide this slot and nothing else
+        with prefetch_ph.container(key="prefetch"):
+            use_stylesheet("prefetch")
+            for path in paths:
+                show_media(path, width=1)
+
+    # Counts the current interval down, either in the browser or with the server tick loop
+    def run_countdown(phase_class, stretch_label=None):
+        resume = st.session_state.get("resume_at")
+        offset = resume[1] if resume and resume[0] == interval.index else 0
+        shown = []
+
+        # Rest media comes from the precomputed playlist; the image only changes with the slot
+        def show_stretch(remaining):
+            path = stretch_at(st.session_state.rest_playlist, interval, remaining)
+            if path and path not in shown[-1:]:
+                render_skip_image(path, stretch_label)
+                shown.append(path)
+
+        if stretch_label:
+            show_stretch(interval.duration - offset)
+            if not shown:
+                render_skip_image(None, stretch_label)
+        prefetch_upcoming()
+        if cfg.get("timer_mode", "server") == "client":
+            phase_id = f"{st.session_state.workout_id}:{interval.index}"
+            with timer_ph.container():
+                event = countdown_timer(
+                    phase_id=phase_id,
+                    seconds=interval.duration - offset,
+                    elapsed=interval.start + offset,
+                    total=timeline.total,
+                    phase_class=phase_class,
+                    key="countdown",
+                    default=None,
+                )
+            # The component value outlives its phase, so only act on our own phase_id
+            if event and event.get("phase_id") == phase_id:
+                end_phase(timeline, interval)
+            return
+
+        # Anchor phases to the workout start so rerun latency between phases doesn't add up;
+        # re-anchor after a skip or when we come back to a phase that should long be over
+        anchor = st.session_state.get("workout_anchor")
+        now = time.monotonic()
+        if anchor is None or now - (anchor + interval.start) >= interval.duration:
+            anchor = now - interval.start
+            st.session_state.workout_anchor = anchor
+
+        scheduler = PhaseScheduler(interval.duration, start=anchor + interval.start)
+        for t in scheduler.ticks():
+            metrics.observe("tick_lateness", scheduler.lateness)
+            with metrics.span("tick"):
+                if stretch_label:
+                    show_stretch(t)
+                current_elapsed = interval.start + (interval.duration - t)
+                progress_text.markdown(f"### ⏱ {format_time(current_elapsed)} / {total_time_str}")
+                progress_bar.progress(progress_fraction(timeline, current_elapsed))
+                timer_ph.markdown(f"<div class='big-timer {phase_class}'>{t}</div>", unsafe_allow_html=True)
+        st.session_state.timer_drift = scheduler.report()
+        end_phase(timeline, interval)
 
     # -------------------------
     # PHASE EXECUTION
     # -------------------------
     if st.session_state.workout_phase == "prepare":
         labels_ph.markdown("<div class='phase-labels'><span class='label-active'>🚀 PREPARE</span></div>", unsafe_allow_html=True)
-        img_url = cfg["exercise_images"].get(current_exercise)
-        render_skip_image(img_url, "GET READY!")
-        
-        for t in range(10, 0, -1):
-            elapsed = 10 - t
-            progress_text.markdown(f"### ⏱ {format_time(elapsed)} / {total_time_str}")
-            progress_bar.progress(min(1.0, elapsed / st.session_state.total_time_seconds))
-            timer_ph.markdown(f"<div class='big-timer rest-phase'>{t}</div>", unsafe_allow_html=True)
-            time.sleep(1)
-        st.session_state.workout_phase = "work"
-        st.session_state.elapsed_time_seconds = 10
-        st.rerun()
+        render_skip_image(interval.image, "GET READY!")
+        run_countdown("rest-phase")
 
     elif st.session_state.workout_phase == "work":
         labels_ph.markdown("<div class='phase-labels'><span class='label-active'>⚡ WORK</span> | <span class='label-faded'>REST 😮‍💨</span></div>", unsafe_allow_html=True)
-        img_url = cfg["exercise_images"].get(current_exercise)
-        render_skip_image(img_url, f"💪 {current_exercise}")
-        
-        work_time = cfg["work_time"]
-        for t in range(work_time, 0, -1):
-            current_elapsed = st.session_state.elapsed_time_seconds + (work_time - t)
-            progress_text.markdown(f"### ⏱ {format_time(current_elapsed)} / {total_time_str}")
-            progress_bar.progress(min(1.0, max(0.0, current_elapsed / st.session_state.total_time_seconds)))
-            timer_ph.markdown(f"<div class='big-timer work-phase'>{t}</div>", unsafe_allow_html=True)
-            time.sleep(1)
-        
-        st.session_state.elapsed_time_seconds += work_time
-        st.session_state.exercise_index += 1
-        if st.session_state.exercise_index < len(curr_list):
-            st.session_state.workout_phase = "rest_exercise"
-        else:
-            st.session_state.workout_phase = "rest_round"
-        st.rerun()
+        render_skip_image(interval.image, f"💪 {interval.exercise}")
+        run_countdown("work-phase")
 
     elif st.session_state.workout_phase == "rest_exercise":
         labels_ph.markdown("<div class='phase-labels'><span class='label-faded'>⚡ WORK</span> | <span class='label-active'>REST 😮‍💨</span></div>", unsafe_allow_html=True)
-        next_exercise = curr_list[st.session_state.exercise_index]
-        rest_duration = cfg["rest_between_exercises"]
-        
-        for t in range(rest_duration, 0, -1):
-            if t == rest_duration or t % 15 == 0:
-                render_skip_image(random.choice(STRETCHING_GIFS), f"NEXT: {next_exercise}")
-            
-            current_elapsed = st.session_state.elapsed_time_seconds + (rest_duration - t)
-            progress_text.markdown(f"### ⏱ {format_time(current_elapsed)} / {total_time_str}")
-            progress_bar.progress(min(1.0, max(0.0, current_elapsed / st.session_state.total_time_seconds)))
-            timer_ph.markdown(f"<div class='big-timer rest-phase'>{t}</div>", unsafe_allow_html=True)
-            time.sleep(1)
-            
-        st.session_state.elapsed_time_seconds += rest_duration
-        st.session_state.workout_phase = "work"
-        st.rerun()
+        run_countdown("rest-phase", stretch_label=f"NEXT: {interval.exercise}")
 
     elif st.session_state.workout_phase == "rest_round":
-        if st.session_state.round == 9:
-            st.session_state.workout_phase = "complete"
-            st.rerun()
-
         labels_ph.markdown("<div class='phase-labels'><span class='label-faded'>⚡ WORK</span> | <span class='label-active'>REST 😮‍💨</span></div>", unsafe_allow_html=True)
         
-        if st.session_state.round == 5:
-            rest_duration = cfg["peak_rest"]
-            label = f"PEAK REST ⛰️: Round {st.session_state.round} of 9"
+        rounds = len(timeline.labels)
+        if interval.round == timeline.peak_round:
+            label = f"PEAK REST ⛰️: Round {interval.round} of {rounds}"
         else:
-            rest_duration = cfg["rest_between_rounds"]
-            label = f"REST BETWEEN ROUNDS: Round {st.session_state.round} of 9"
+            label = f"REST BETWEEN ROUNDS: Round {interval.round} of {rounds}"
+        run_countdown("rest-phase", stretch_label=label)
 
-        for t in range(rest_duration, 0, -1):
-            if t == rest_duration or t % 15 == 0:
-                render_skip_image(random.choice(STRETCHING_GIFS), label)
-            
-            current_elapsed = st.session_state.elapsed_time_seconds + (rest_duration - t)
-            progress_text.markdown(f"### ⏱ {format_time(current_elapsed)} / {total_time_str}")
-            progress_bar.progress(min(1.0, max(0.0, current_elapsed / st.session_state.total_time_seconds)))
-            timer_ph.markdown(f"<div class='big-timer rest-phase'>{t}</div>", unsafe_allow_html=True)
-            time.sleep(1)
-
-        st.session_state.elapsed_time_seconds += rest_duration
-        st.session_state.round += 1
-        st.session_state.exercise_index = 0
-        st.session_state.workout_phase = "work"
+    else:
+        # Completed (e.g. skipped past the end) inside a fragment run: the page has to switch screens
         st.rerun()
 
-    elif st.session_state.workout_phase == "complete":
-        st.balloons()
-        st.success("🎉 WORKOUT COMPLETE! Amazing job!")
-        total_time_str = format_time(st.session_state.total_time_seconds)
-        progress_ph.markdown(f"### Total Workout Time: **{total_time_str}**")
-        st.progress(1.0)
-        if st.button("Back to Setup"):
-            st.session_state.workout_started = False
-            st.session_state.elapsed_time_seconds = 0
-            st.session_state.workout_phase = "prepare"
-            st.rerun()
-        return "complete"
-
-    return "active"
-
 
 # ---------------------------
 # Entrypoint (FIXED)
 # ---------------------------
 def main():
     init_hiit_session()
+    metrics.count("reruns", screen="hiit")
     # FIX: Ensure setup screen does not render if workout has started, 
     # preventing the ghosting effect (Issue B).
     if st.session_state.workout_started:
@@ -491,4 +498,5 @@ def main():
 
 if __name__ == "__main__":
     st.set_page_config(page_title="Pyramid HIIT Timer", page_icon="🔥", layout="wide")
+    track(active="hiit")
     main()
\ No newline at end of file
@@ -0,0 +1,42 @@
+# ASGI entry point: the app plus long-lived caching for fingerprinted static files.
+# Streamlit's app/static/ route only sends ETag/Last-Modified, so without this a
+# browser revalidates every stylesheet and GIF on each visit.
+#
+#   streamlit run serve.py                          # the dashboard (exercise_app.py)
+#   APP_SCRIPT=class_mode.py streamlit run serve.py
+#   uvicorn serve:app --port 8501
+import os
+from urllib.parse import parse_qs
+
+import streamlit as st
+from starlette.middleware import Middleware
+
+APP_SCRIPT = os.environ.get("APP_SCRIPT", "exercise_app.py")
+STATIC_PREFIX = "/app/static/"
+# styles.py and media_route.py put a content digest in ?v=, so a URL's bytes never change
+IMMUTABLE = b"public, max-age=31536000, immutable"
+
+# ---------------------------
+# Cache headers
+# ---------------------------
+class ImmutableStatic:
+    # Plain ASGI middleware: rewrites Cache-Control on fingerprinted app/static/ responses
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not fingerprinted(scope):
+            return await self.app(scope, receive, send)
+
+        async def send_cached(message):
+            if message["type"] == "http.response.start" and message["status"] in (200, 206, 304):
+                headers = [(k, v) for k, v in message.get("headers", []) if k.lower() != b"cache-control"]
+                message = dict(message, headers=headers + [(b"cache-control", IMMUTABLE)])
+            await send(message)
+
+        return await self.app(scope, receive, send_cached)
+
+def fingerprinted(scope):
+    return STATIC_PREFIX in scope["path"] and "v" in parse_qs(scope.get("query_string", b"").decode())
+
+app = st.App(APP_SCRIPT, middleware=[Middleware(ImmutableStatic)])
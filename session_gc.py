@@ -0,0 +1,160 @@
+import logging
+import sys
+import threading
+import time
+import weakref
+
+import streamlit as st
+
+import instrumentation as metrics
+
+# A full run's estimate above this drops the state of workouts that aren't on screen
+SESSION_STATE_LIMIT = 1 << 20
+# Sessions with no run for this long lose everything but their identity; the
+# SQLite settings and checkpoints bring them back on their next run
+IDLE_SECONDS = 60 * 60
+SWEEP_INTERVAL = 60
+# Never dropped: who the session is and its metrics label
+KEEP = ("user_id", "metrics_session")
+
+log = logging.getLogger(__name__)
+
+# ---------------------------
+# Workout state namespaces
+# ---------------------------
+# Keys each workout kind owns ("prefix_*" matches by prefix). Preferences that
+# should survive a workout (selected_sequence, workout_format) are not listed.
+WORKOUT_STATE = {
+    "hiit": (
+        "round", "exercise_index", "workout_phase", "interval_index", "timeline", "rest_playlist",
+        "total_time_seconds", "elapsed_time_seconds", "workout_started", "workout_id",
+        "workout_anchor", "resume_at", "phase_started_at", "timer_drift",
+    ),
+    "strength": ("strength_*", "choice_*", "select_*"),
+}
+
+def _owned(kind, key):
+    return any(
+        str(key).startswith(pattern[:-1]) if pattern.endswith("*") else key == pattern
+        for pattern in WORKOUT_STATE[kind]
+    )
+
+def drop_workout_state(kind, state=None):
+    # Called on completion and on mode switches; the init functions recreate defaults
+    state = st.session_state if state is None else state
+    dropped = [key for key in list(_keys(state)) if _owned(kind, key)]
+    for key in dropped:
+        del state[key]
+    return dropped
+
+def _keys(state):
+    # st.session_state for this run, or another session's SafeSessionState when sweeping
+    return state.filtered_state.keys() if hasattr(state, "filtered_state") else state.keys()
+
+# ---------------------------
+# Footprint
+# ---------------------------
+def footprint(value, seen=None, depth=0):
+    # Rough deep size in bytes; good enough to rank sessions and enforce a cap
+    seen = set() if seen is None else seen
+    if id(value) in seen or depth > 8:
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, (str, bytes, int, float, bool, type(None))):
+        return size
+    if hasattr(value, "overrides"):
+        # SessionConfig: only the overrides belong to the session; the catalog is shared
+        return size + footprint(value.overrides, seen, depth + 1)
+    if isinstance(value, dict):
+        return size + sum(footprint(k, seen, depth + 1) + footprint(v, seen, depth + 1) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return size + sum(footprint(v, seen, depth + 1) for v in value)
+    return size
+
+def state_footprint(state):
+    seen = set()
+    return sum(footprint(state[key], seen) for key in list(_keys(state)))
+
+# ---------------------------
+# Session registry
+# ---------------------------
+# One entry per live session: last run time, last footprint and a weak reference
+# to its session state, so a sweep from any session can trim the idle ones.
+_lock = threading.Lock()
+_sessions = {}
+_last_sweep = 0.0
+
+def _current_state():
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return None, None
+    return ctx.session_id, ctx.session_state
+
+def track(active=None):
+    # Once per full run: caps this session's state and sweeps idle sessions
+    global _last_sweep
+    session_id, safe_state = _current_state()
+    if session_id is None:
+        return
+    size = state_footprint(st.session_state)
+    if size > SESSION_STATE_LIMIT:
+        for kind in WORKOUT_STATE:
+            if kind != active and drop_workout_state(kind):
+                metrics.count("session_evictions", reason="cap")
+        size = state_footprint(st.session_state)
+        if size > SESSION_STATE_LIMIT:
+            log.warning("session %s holds %d bytes of state (limit %d)", session_id, size, SESSION_STATE_LIMIT)
+
+    now = time.monotonic()
+    with _lock:
+        try:
+            ref = weakref.ref(safe_state)
+        except TypeError:
+            ref = lambda: safe_state
+        _sessions[session_id] = (now, size, ref)
+        sweep = now - _last_sweep >= SWEEP_INTERVAL
+        if sweep:
+            _last_sweep = now
+    if sweep:
+        sweep_idle(now, exclude=session_id)
+    with _lock:
+        sizes = [entry[1] for entry in _sessions.values()]
+    metrics.gauge("sessions", len(sizes))
+    metrics.gauge("session_state_bytes", sum(sizes))
+    metrics.gauge("session_state_max_bytes", max(sizes, default=0))
+
+def touch():
+    # Fragment-only runs (a class viewer's polls) never call track(); keep them from looking idle
+    session_id, _ = _current_state()
+    if session_id is None:
+        return
+    with _lock:
+        entry = _sessions.get(session_id)
+        if entry is not None:
+            _sessions[session_id] = (time.monotonic(), *entry[1:])
+
+def sweep_idle(now=None, exclude=None):
+    now = time.monotonic() if now is None else now
+    with _lock:
+        stale = [(sid, entry) for sid, entry in _sessions.items()
+                 if sid != exclude and now - entry[0] >= IDLE_SECONDS]
+        for sid, _ in stale:
+            del _sessions[sid]
+    for sid, (_, _, ref) in stale:
+        state = ref()
+        if state is None:
+            # Already gone with its websocket
+            continue
+        try:
+            for key in list(_keys(state)):
+                if key not in KEEP:
+                    del state[key]
+        except Exception:
+            # A session closing under us; nothing left to free
+            log.debug("could not trim idle session %s", sid, exc_info=True)
+            continue
+        metrics.count("session_evictions", reason="idle")
+    return len(stale)
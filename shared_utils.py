@@ -1,5 +1,11 @@
 import json
+from collections.abc import MutableMapping
+from functools import lru_cache
 from pathlib import Path
+from types import MappingProxyType
+from instrumentation import timed
+from state_store import DEFAULT_USER, load_user_state, save_user_state
+from workout_timeline import compile_timeline
 
 STRETCHING_GIFS = [
     "exercises/stretch_child_pose.gif",
@@ -11,37 +17,149 @@ STRETCHING_GIFS = [
     "exercises/stretch_hamstring_stretch.gif",
     "exercises/stretch_glute_stretch.gif"
 ]
+# Muscle groups each stretch targets; matched against the catalog's "exercise_muscles"
+STRETCH_TARGETS = {
+    "exercises/stretch_child_pose.gif": ("back", "core", "shoulders"),
+    "exercises/stretch_lunge_stretch.gif": ("hips", "quads"),
+    "exercises/stretch_tricep_stretch.gif": ("arms",),
+    "exercises/stretch_shoulder_stretch.gif": ("shoulders", "chest"),
+    "exercises/stretch_quad_stretch.gif": ("quads",),
+    "exercises/stretch_hip_stretch.gif": ("hips", "glutes"),
+    "exercises/stretch_hamstring_stretch.gif": ("hamstrings",),
+    "exercises/stretch_glute_stretch.gif": ("glutes", "hips"),
+}
 
-def load_config():
-    path = Path("hiit_config.json")
-    if path.exists():
-        with open(path, "r") as f:
-            return json.load(f)
-    return {}
+MEDIA_ROOT = Path("exercises")
+RENDITION_DIR = MEDIA_ROOT / "renditions"
+RENDITION_MANIFEST = RENDITION_DIR / "manifest.json"
+# Formats st.image passes through untouched (it re-encodes anything else to a still frame)
+ST_IMAGE_FORMATS = ("gif", "jpeg", "png")
+# Content-addressed library index (written by asset_index.py)
+ASSET_STORE = MEDIA_ROOT / "store"
+ASSET_MANIFEST = MEDIA_ROOT / "asset_manifest.json"
 
-def save_config(cfg):
-    path = Path("hiit_config.json")
-    with open(path, "w") as f:
-        json.dump(cfg, f, indent=2)
+CATALOG_PATH = Path("hiit_config.json")
+
+# ---------------------------
+# Shared catalog
+# ---------------------------
+# Parsed once per process and shared by every session: dicts become read-only
+# proxies and lists become tuples. A new mtime reloads it on the next lookup.
+def load_catalog():
+    # Read-only: sequences, images, metadata and the default per-user settings
+    try:
+        mtime = CATALOG_PATH.stat().st_mtime_ns
+    except FileNotFoundError:
+        return MappingProxyType({})
+    return _read_catalog(mtime)
+
+@lru_cache(maxsize=1)
+def _read_catalog(mtime):
+    with open(CATALOG_PATH, "r") as f:
+        return _freeze(json.load(f))
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+class SessionConfig(MutableMapping):
+    # A session's own overrides on top of the shared catalog; writes only touch the overrides
+    def __init__(self, overrides=None):
+        self.overrides = dict(overrides or {})
+
+    def __getitem__(self, key):
+        if key in self.overrides:
+            return self.overrides[key]
+        return load_catalog()[key]
+
+    def __setitem__(self, key, value):
+        self.overrides[key] = value
+
+    def __delitem__(self, key):
+        del self.overrides[key]
+
+    def __iter__(self):
+        return iter(self.overrides.keys() | load_catalog().keys())
+
+    def __len__(self):
+        return len(self.overrides.keys() | load_catalog().keys())
+
+@timed("load_config")
+def load_config(user=DEFAULT_USER):
+    return SessionConfig(load_user_state(user))
+
+@timed("save_config")
+def save_config(cfg, user=DEFAULT_USER):
+    # Only the user's changed settings are written; the catalog file is never rewritten
+    return save_user_state(cfg, user)
+
+# ---------------------------
+# Media renditions (built offline by build_assets.py)
+# ---------------------------
+def load_media_manifest():
+    return _load_manifest(RENDITION_MANIFEST).get("assets", {})
+
+def _load_manifest(path):
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        return {}
+    return _read_manifest(path, mtime)
+
+@lru_cache(maxsize=4)
+def _read_manifest(path, mtime):
+    with open(path, "r") as f:
+        return json.load(f)
+
+def media_for(path, box=400, formats=ST_IMAGE_FORMATS):
+    # Smallest rendition at least `box` px tall, falling back to the original file
+    entry = load_media_manifest().get(path)
+    if not entry:
+        return asset_path(path)
+    candidates = sorted(
+        (r for r in entry["renditions"] if r["format"] in formats),
+        key=lambda r: (r["height"], r["bytes"]),
+    )
+    if not candidates:
+        return asset_path(path)
+    best = next((r for r in candidates if r["height"] >= box), candidates[-1])
+    return best["path"] if best["bytes"] < entry["bytes"] else asset_path(path)
+
+# ---------------------------
+# Asset index (built offline by asset_index.py)
+# ---------------------------
+def load_asset_manifest():
+    return _load_manifest(ASSET_MANIFEST)
+
+def asset_path(path):
+    # The content-addressed copy when one was stored, so duplicates share a single file
+    manifest = load_asset_manifest()
+    digest = manifest.get("references", {}).get(path)
+    store = manifest.get("blobs", {}).get(digest, {}).get("store")
+    return store if store and Path(store).exists() else path
+
+def missing_media(cfg, exercises):
+    # (exercise, path) pairs that would render as a blank box; path is None when unmapped
+    refs = load_asset_manifest().get("references", {})
+    images = cfg.get("exercise_images", {})
+    missing = []
+    for ex in exercises:
+        for name in (ex if isinstance(ex, tuple) else [ex]):
+            path = images.get(name)
+            if path is None:
+                missing.append((name, None))
+            elif (refs[path] is None) if path in refs else not Path(path).exists():
+                missing.append((name, path))
+    return missing
 
 def format_time(seconds):
     minutes = int(seconds) // 60
     seconds = int(seconds) % 60
     return f"{minutes:02d}:{seconds:02d}"
 
-def calculate_total_time(cfg):
-    W = cfg.get("work_time", 30)
-    RE = cfg.get("rest_between_exercises", 45)
-    RR = cfg.get("rest_between_rounds", 60)
-    RP = cfg.get("peak_rest", 75)
-    
-    total_work_intervals = 25
-    total_rest_between_exercise_intervals = 16 
-    total_rest_between_round_intervals = 7 
-    total_peak_rest_intervals = 1 
-
-    total_time = (total_work_intervals * W) + \
-                 (total_rest_between_exercise_intervals * RE) + \
-                 (total_rest_between_round_intervals * RR) + \
-                 (total_peak_rest_intervals * RP) + 10 # 10s initial countdown
-    return total_time
+def calculate_total_time(cfg, sequence, plan=None):
+    # Includes the initial countdown; derived from the sequence and its round plan, not fixed counts
+    return compile_timeline(sequence, cfg, plan=plan).total
@@ -0,0 +1,152 @@
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+# HIIT_STATE_DB lets a tool point a server it starts at its own database
+STATE_DB = Path(os.environ.get("HIIT_STATE_DB", "hiit_state.db"))
+DEFAULT_USER = "default"
+# Checkpoints older than this are dropped instead of resumed
+RESUME_WINDOW = 2 * 60 * 60
+# Small mutable per-user settings; the rest of hiit_config.json is the read-only catalog
+USER_KEYS = (
+    "current_program",
+    "current_program_day",
+    "work_time",
+    "rest_between_exercises",
+    "rest_between_rounds",
+    "peak_rest",
+    "timer_mode",
+    "workout_format",
+)
+
+# ---------------------------
+# SQLite backend
+# ---------------------------
+# One row per (user, key). A connection per call keeps it safe across
+# Streamlit's script threads; WAL lets readers run alongside a writer.
+def connect():
+    conn = sqlite3.connect(STATE_DB, timeout=5, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS user_state ("
+        " user TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, updated REAL NOT NULL,"
+        " PRIMARY KEY (user, key))"
+    )
+    return conn
+
+@contextmanager
+def scratch_db():
+    # Benchmarks and load tests: a throwaway database for this process and any
+    # server it starts, so their runs never land in the real hiit_state.db
+    global STATE_DB
+    saved, saved_env = STATE_DB, os.environ.get("HIIT_STATE_DB")
+    tmp = tempfile.mkdtemp(prefix="hiit-state-")
+    STATE_DB = Path(tmp) / "hiit_state.db"
+    os.environ["HIIT_STATE_DB"] = str(STATE_DB)
+    try:
+        yield STATE_DB
+    finally:
+        STATE_DB = saved
+        if saved_env is None:
+            os.environ.pop("HIIT_STATE_DB", None)
+        else:
+            os.environ["HIIT_STATE_DB"] = saved_env
+        shutil.rmtree(tmp, ignore_errors=True)
+
+def load_user_state(user=DEFAULT_USER):
+    conn = connect()
+    try:
+        rows = conn.execute("SELECT key, value FROM user_state WHERE user = ?", (user,)).fetchall()
+    finally:
+        conn.close()
+    return {key: json.loads(value) for key, value in rows if key in USER_KEYS}
+
+def save_user_state(state, user=DEFAULT_USER):
+    # Writes only the keys whose value changed, in one transaction; returns them
+    values = {key: json.dumps(state[key]) for key in USER_KEYS if key in state}
+    now = time.time()
+    conn = connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            stored = dict(conn.execute("SELECT key, value FROM user_state WHERE user = ?", (user,)))
+            changed = [key for key, value in values.items() if stored.get(key) != value]
+            conn.executemany(
+                "INSERT INTO user_state (user, key, value, updated) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (user, key) DO UPDATE SET value = excluded.value, updated = excluded.updated",
+                [(user, key, values[key], now) for key in changed],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+    return changed
+
+# ---------------------------
+# Workout checkpoints
+# ---------------------------
+# One small row appended per phase/set boundary; older rows for the same
+# (user, kind) are dropped in the same transaction, so the table stays tiny.
+def _checkpoints(conn):
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS checkpoints ("
+        " id INTEGER PRIMARY KEY AUTOINCREMENT, user TEXT NOT NULL, kind TEXT NOT NULL,"
+        " payload TEXT NOT NULL, at REAL NOT NULL)"
+    )
+    return conn
+
+def save_checkpoint(kind, payload, user=DEFAULT_USER):
+    conn = _checkpoints(connect())
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            cur = conn.execute(
+                "INSERT INTO checkpoints (user, kind, payload, at) VALUES (?, ?, ?, ?)",
+                (user, kind, json.dumps(payload, separators=(",", ":")), time.time()),
+            )
+            conn.execute("DELETE FROM checkpoints WHERE user = ? AND kind = ? AND id < ?", (user, kind, cur.lastrowid))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+def load_checkpoint(kind, user=DEFAULT_USER):
+    # (payload, written_at) of the newest checkpoint, or None
+    conn = _checkpoints(connect())
+    try:
+        row = conn.execute(
+            "SELECT payload, at FROM checkpoints WHERE user = ? AND kind = ? ORDER BY id DESC LIMIT 1",
+            (user, kind),
+        ).fetchone()
+    finally:
+        conn.close()
+    return (json.loads(row[0]), row[1]) if row else None
+
+def resumable_checkpoint(kind, user=DEFAULT_USER, sequence=None):
+    # The newest checkpoint when it's inside the resume window (and for `sequence`, if given);
+    # an expired one is cleared so nothing picks it up later
+    saved = load_checkpoint(kind, user)
+    if saved is None:
+        return None
+    if time.time() - saved[1] > RESUME_WINDOW:
+        clear_checkpoint(kind, user)
+        return None
+    if sequence is not None and saved[0].get("sequence") != sequence:
+        return None
+    return saved
+
+def clear_checkpoint(kind, user=DEFAULT_USER):
+    conn = _checkpoints(connect())
+    try:
+        conn.execute("DELETE FROM checkpoints WHERE user = ? AND kind = ?", (user, kind))
+    finally:
+        conn.close()
@@ -0,0 +1,99 @@
+import logging
+import re
+from collections import namedtuple
+
+from shared_utils import load_catalog
+
+DEFAULT_SETS = 3
+
+log = logging.getLogger(__name__)
+
+# ---------------------------
+# Compiled strength metadata
+# ---------------------------
+# Built once per catalog load; the strength screen only does lookups.
+StrengthSpec = namedtuple(
+    "StrengthSpec",
+    ["name", "min_sets", "max_sets", "min_reps", "max_reps", "per_side", "to_failure",
+     "sets_text", "reps_text", "cues", "cues_markdown"],
+)
+StrengthIndex = namedtuple("StrengthIndex", ["specs", "problems"])
+
+# "3", "3-4", "2-3 each", "8-12 each leg"
+RANGE = re.compile(r"^\s*(\d+)\s*(?:-\s*(\d+))?\b")
+
+def parse_range(text):
+    m = RANGE.match(text or "")
+    if not m:
+        return None, None
+    low = int(m.group(1))
+    return low, int(m.group(2) or low)
+
+def compile_spec(name, meta):
+    problems = []
+    sets_text = meta.get("sets", "")
+    reps_text = meta.get("reps", "")
+    min_sets, max_sets = parse_range(sets_text)
+    if max_sets is None:
+        problems.append(f"{name}: unreadable sets {sets_text!r}, using {DEFAULT_SETS}")
+        min_sets = max_sets = DEFAULT_SETS
+    elif min_sets > max_sets:
+        problems.append(f"{name}: sets range {sets_text!r} is backwards")
+        min_sets, max_sets = max_sets, min_sets
+
+    to_failure = "failure" in reps_text.lower()
+    min_reps, max_reps = parse_range(reps_text)
+    if min_reps is None and not to_failure:
+        problems.append(f"{name}: unreadable reps {reps_text!r}")
+
+    cues = tuple(cue.strip() for cue in meta.get("cues", "").split(";") if cue.strip())
+    spec = StrengthSpec(
+        name=name,
+        min_sets=min_sets,
+        max_sets=max_sets,
+        min_reps=min_reps,
+        max_reps=max_reps,
+        per_side="each" in sets_text.lower() or "each" in reps_text.lower(),
+        to_failure=to_failure,
+        sets_text=sets_text or "N/A",
+        reps_text=reps_text or "N/A",
+        cues=cues,
+        cues_markdown="\n".join(f"- {cue}" for cue in cues),
+    )
+    return spec, problems
+
+def compile_index(catalog):
+    specs = {}
+    problems = []
+    for name, meta in catalog.get("strength_metadata", {}).items():
+        specs[name], found = compile_spec(name, meta)
+        problems.extend(found)
+
+    categories = catalog.get("sequence_categories", {})
+    for seq, exercises in catalog.get("exercise_sequences", {}).items():
+        if categories.get(seq) != "strength":
+            continue
+        for ex in exercises:
+            for name in (ex if isinstance(ex, tuple) else [ex]):
+                if name not in specs:
+                    problems.append(f"{name}: no strength_metadata (used in {seq}), using {DEFAULT_SETS} sets")
+
+    for problem in problems:
+        log.warning("strength metadata: %s", problem)
+    return StrengthIndex(specs, tuple(problems))
+
+_index = (None, None)
+
+def strength_index():
+    # Recompiled only when the shared catalog object changes (i.e. on hot reload)
+    global _index
+    catalog = load_catalog()
+    if _index[0] is not catalog:
+        _index = (catalog, compile_index(catalog))
+    return _index[1]
+
+def spec_for(name):
+    spec = strength_index().specs.get(name)
+    if spec is None:
+        spec, _ = compile_spec(name, {})
+    return spec
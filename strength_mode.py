@@ -1,20 +1,58 @@
 import streamlit as st
 import time
-import random
-from shared_utils import STRETCHING_GIFS, load_config, save_config, format_time
+import instrumentation as metrics
+from styles import use_stylesheet
+from media_route import show_image, show_media
+from session_gc import drop_workout_state
+from shared_utils import DEFAULT_USER, load_config, missing_media
+from state_store import clear_checkpoint, resumable_checkpoint, save_checkpoint
+from strength_metadata import spec_for
+from workout_history import record_set, record_workout
+from thumbnail_cache import thumbnail_for
 
-def init_strength_session():
+def init_strength_session(sequence_key=None):
+    if "user_id" not in st.session_state:
+        st.session_state.user_id = st.query_params.get("user", DEFAULT_USER)
     if "config" not in st.session_state:
-        st.session_state.config = load_config()
+        st.session_state.config = load_config(st.session_state.user_id)
     if "strength_started" not in st.session_state:
         st.session_state.strength_started = False
+        # A fresh session (reconnect, restart) resumes at the set it left off on
+        resume_strength_session(sequence_key)
     if "strength_exercise_index" not in st.session_state:
         st.session_state.strength_exercise_index = 0
     if "strength_set_index" not in st.session_state:
         st.session_state.strength_set_index = 0
+    if "metrics_session" not in st.session_state:
+        st.session_state.metrics_session = f"{time.time_ns():x}"[-8:]
+    metrics.bind(session=st.session_state.metrics_session, phase="strength")
 
+# ---------------------------
+# Checkpoint and resume
+# ---------------------------
+def checkpoint_set(sequence_key):
+    choices = {k: v for k, v in st.session_state.items() if str(k).startswith("choice_")}
+    save_checkpoint("strength", {
+        "sequence": sequence_key,
+        "exercise_index": st.session_state.strength_exercise_index,
+        "set_index": st.session_state.strength_set_index,
+        "choices": choices,
+    }, st.session_state.user_id)
+
+def resume_strength_session(sequence_key):
+    saved = resumable_checkpoint("strength", st.session_state.user_id, sequence_key)
+    if not saved:
+        return
+    state = saved[0]
+    st.session_state.strength_exercise_index = state["exercise_index"]
+    st.session_state.strength_set_index = state["set_index"]
+    for key, value in state["choices"].items():
+        st.session_state[key] = value
+
+@metrics.timed("show_strength_screen")
 def show_strength_screen(sequence_key):
-    init_strength_session()
+    init_strength_session(sequence_key)
+    metrics.count("reruns", screen="strength")
     cfg = st.session_state.config
     exercises = cfg["exercise_sequences"].get(sequence_key, [])
     
@@ -28,16 +66,27 @@ def show_strength_screen(sequence_key):
         st.markdown(f"### {sequence_key}")
         for i, ex in enumerate(exercises):
             prefix = "➡️ " if i == st.session_state.strength_exercise_index else "✅ " if i < st.session_state.strength_exercise_index else "⚪ "
-            st.markdown(f"{prefix}{ex}")
+            thumb_url = cfg["exercise_images"].get(ex[0] if isinstance(ex, tuple) else ex)
+            thumb_col, name_col = st.columns([1, 3], vertical_alignment="center")
+            with thumb_col:
+                if thumb_url:
+                    show_image(thumbnail_for(thumb_url, width=96), use_container_width=True)
+            with name_col:
+                st.markdown(f"{prefix}{' / '.join(ex) if isinstance(ex, tuple) else ex}")
         
+        missing = missing_media(cfg, exercises)
+        if missing:
+            st.warning("Missing media: " + ", ".join(ex for ex, _ in missing))
+
         if st.button("Reset Workout"):
-            st.session_state.strength_exercise_index = 0
-            st.session_state.strength_set_index = 0
-            st.session_state.strength_started = False
+            clear_checkpoint("strength", st.session_state.user_id)
+            # init_strength_session starts over from a clean namespace
+            drop_workout_state("strength")
             st.rerun()
 
     # Main Area
     if st.session_state.strength_exercise_index >= len(exercises):
+        clear_checkpoint("strength", st.session_state.user_id)
         st.balloons()
         st.success("🎉 Strength Session Complete!")
         if st.button("Back to Dashboard"):
@@ -47,7 +96,7 @@ def show_strength_screen(sequence_key):
     raw_ex = exercises[st.session_state.strength_exercise_index]
     
     # Handle list-based choice logic
-    if isinstance(raw_ex, list):
+    if isinstance(raw_ex, tuple):
         options = raw_ex
         choice_key = f"choice_{st.session_state.strength_exercise_index}"
         if choice_key not in st.session_state or st.session_state[choice_key] not in options:
@@ -66,25 +115,27 @@ def show_strength_screen(sequence_key):
 
     # Update Sidebar with selection info if applicable
     with st.sidebar:
-        if isinstance(raw_ex, list):
+        if isinstance(raw_ex, tuple):
             st.info(f"Selected: {current_ex}")
 
-    metadata = cfg.get("strength_metadata", {}).get(current_ex, {})
+    spec = spec_for(current_ex)
     img_url = cfg["exercise_images"].get(current_ex)
 
     # Helper for advancing set logic
-    target_sets_str = metadata.get('sets', "3").split("-")[-1] 
-    try:
-        target_sets = int(target_sets_str)
-    except:
-        target_sets = 3
+    target_sets = spec.max_sets
 
     def advance_set():
+        user = st.session_state.user_id
+        record_set(current_ex, st.session_state.strength_set_index + 1, sequence_key,
+                   variations=list(raw_ex) if isinstance(raw_ex, tuple) else None, user=user)
         st.session_state.strength_set_index += 1
         if st.session_state.strength_set_index >= target_sets:
             st.session_state.strength_exercise_index += 1
             st.session_state.strength_set_index = 0
             st.toast(f"Exercise {current_ex} complete!")
+            if st.session_state.strength_exercise_index >= len(exercises):
+                record_workout("strength", sequence_key, user=user)
+        checkpoint_set(sequence_key)
         st.rerun()
 
     st.header(f"{current_ex}")
@@ -93,47 +144,21 @@ def show_strength_screen(sequence_key):
     
     with col1:
         if img_url:
-            # Enforce image height and button overlay via direct CSS
-            st.markdown(
-                """
-                <style>
-                /* Target the image in the first main-area column */
-                [data-testid="stColumn"]:nth-of-type(1) img {
-                    max-height: 400px !important;
-                    width: auto !important;
-                    object-fit: contain !important;
-                    margin-left: auto;
-                    margin-right: auto;
-                    display: block;
-                }
-                /* Target the button in the same column and make it an invisible overlay */
-                [data-testid="stColumn"]:nth-of-type(1) button {
-                    position: absolute !important;
-                    height: 400px !important;
-                    width: 100% !important;
-                    opacity: 0 !important;
-                    z-index: 1000 !important;
-                    border: none !important;
-                    cursor: pointer;
-                    top: 0;
-                    left: 0;
-                }
-                </style>
-                """, unsafe_allow_html=True
-            )
+            # Enforce image height and button overlay
+            use_stylesheet("strength")
             
             # The button renders first in the DOM, becoming an overlay for what follows
             if st.button("Complete Set", key="clickable_img_overlay", use_container_width=True):
                 advance_set()
                 
-            st.image(img_url, use_container_width=True)
+            show_media(img_url, use_container_width=True)
             st.caption("Tip: You can tap the image to complete a set!")
         else:
             st.info("No image available for this exercise.")
             
     with col2:
-        st.markdown(f"**Sets:** {metadata.get('sets', 'N/A')}")
-        st.markdown(f"**Reps:** {metadata.get('reps', 'N/A')}")
+        st.markdown(f"**Sets:** {spec.sets_text}")
+        st.markdown(f"**Reps:** {spec.reps_text}")
 
         st.divider()
 
@@ -146,8 +171,6 @@ def show_strength_screen(sequence_key):
         st.divider()
 
         st.markdown("**Cues:**")
-        cues_list = metadata.get('cues', "").split(";")
-        cues_markdown = "\n".join([f"- {cue.strip()}" for cue in cues_list if cue.strip()])
-        st.markdown(cues_markdown)
+        st.markdown(spec.cues_markdown)
 
     return "active"
@@ -0,0 +1,30 @@
+import hashlib
+from functools import lru_cache
+from pathlib import Path
+
+import streamlit as st
+
+# Served by Streamlit at app/static/ when server.enableStaticServing is on (.streamlit/config.toml)
+STATIC_DIR = Path(__file__).parent / "static"
+
+# ---------------------------
+# Stylesheet registry
+# ---------------------------
+# With static serving a rerun carries only a short fingerprinted <link>; the browser
+# caches the sheet (for good under serve.py) and a changed file gets a new URL. Without it the sheet is
+# inlined, as before. Either way the tag is identical across reruns, so the
+# frontend keeps the existing element instead of rebuilding it.
+def use_stylesheet(name):
+    st.markdown(stylesheet_tag(name, st.get_option("server.enableStaticServing")), unsafe_allow_html=True)
+
+def stylesheet_tag(name, static=True):
+    path = STATIC_DIR / f"{name}.css"
+    return _tag(name, path.stat().st_mtime_ns, static)
+
+@lru_cache(maxsize=32)
+def _tag(name, mtime_ns, static):
+    css = (STATIC_DIR / f"{name}.css").read_text()
+    if static:
+        digest = hashlib.sha256(css.encode()).hexdigest()[:12]
+        return f'<link rel="stylesheet" href="app/static/{name}.css?v={digest}">'
+    return f"<style>\n{css}</style>"
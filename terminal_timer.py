@@ -0,0 +1,210 @@
+# Terminal frontend: runs the same compiled timeline and PhaseScheduler as the
+# Streamlit pages, with bell cues instead of a browser. No Streamlit import, so
+# it starts in a fraction of a second on small boxes.
+#
+#   python terminal_timer.py                         # today's program day
+#   python terminal_timer.py hiit --sequence "Core Focus" --format Tabata
+#   python terminal_timer.py strength --sequence "Leg Day"
+#   Ctrl+C skips the current interval; twice within a second quits.
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from interval_scheduler import PhaseScheduler
+from program_schedule import day_info, next_position, position_for, program_for, save_position
+from shared_utils import DEFAULT_USER, STRETCH_TARGETS, calculate_total_time, format_time, load_config
+from strength_metadata import spec_for
+from workout_history import record_interval, record_set, record_workout
+from workout_patterns import DEFAULT_FORMATS, plan_for_format
+from workout_timeline import compile_timeline, rest_playlist, round_exercises
+
+PHASE_NAMES = {
+    "prepare": "GET READY",
+    "work": "WORK",
+    "rest_exercise": "REST",
+    "rest_round": "ROUND REST",
+}
+# Bells on the last seconds of every interval
+COUNTDOWN_BELLS = 3
+QUIT_WINDOW = 1.0
+
+class Terminal:
+    def __init__(self, bell=True, out=sys.stdout):
+        self.bell = bell
+        self.out = out
+        self.live = out.isatty()
+
+    def ring(self, times=1):
+        if self.bell:
+            self.out.write("\a" * times)
+            self.out.flush()
+
+    def line(self, text=""):
+        if self.live:
+            self.out.write("\r\033[K")
+        self.out.write(text + "\n")
+        self.out.flush()
+
+    def status(self, text):
+        # Redrawn in place on a terminal; skipped when piped to a file
+        if self.live:
+            self.out.write("\r\033[K" + text)
+            self.out.flush()
+
+# ---------------------------
+# HIIT
+# ---------------------------
+def run_hiit(cfg, sequence_name, format_name, term, user=DEFAULT_USER):
+    exercises = cfg["exercise_sequences"][sequence_name]
+    formats = cfg.get("workout_formats") or DEFAULT_FORMATS
+    format_name = format_name if format_name in formats else next(iter(formats))
+    plan = plan_for_format(formats[format_name], len(exercises))
+    timeline = compile_timeline(exercises, cfg, cfg.get("exercise_images"), plan)
+    workout_id = time.time_ns()
+    playlist = rest_playlist(timeline, workout_id, STRETCH_TARGETS, cfg.get("exercise_muscles", {}))
+
+    term.line(f"{sequence_name} · {format_name} · {format_time(calculate_total_time(cfg, exercises, plan))}")
+    term.line(" → ".join(plan.labels))
+
+    anchor = time.monotonic()
+    last_interrupt = 0.0
+    announced = 0
+    for interval in timeline.intervals:
+        # Once per round; AMRAP rounds come back to their first exercise every lap
+        if interval.phase == "work" and interval.round != announced:
+            announced = interval.round
+            names = ", ".join(dict.fromkeys(round_exercises(interval.round, exercises, plan)))
+            term.line(f"Round {interval.round}/{len(plan.rounds)} ({plan.labels[interval.round - 1]}): {names}")
+        upcoming = interval.exercise if interval.phase == "work" else f"next: {interval.exercise}"
+        term.line(f"{PHASE_NAMES[interval.phase]:>10}  {upcoming}")
+        if playlist[interval.index]:
+            stretches = dict.fromkeys(Path(p).stem.replace("stretch_", "").replace("_", " ") for p in playlist[interval.index])
+            term.line(f"{'stretch':>10}  {' → '.join(stretches)}")
+        term.ring(2 if interval.phase == "work" else 1)
+
+        # Same anchoring as the server tick loop: late phases re-anchor instead of being rushed
+        now = time.monotonic()
+        if now - (anchor + interval.start) >= interval.duration:
+            anchor = now - interval.start
+        started = time.monotonic()
+        skipped = False
+        scheduler = PhaseScheduler(interval.duration, start=anchor + interval.start)
+        try:
+            for t in scheduler.ticks():
+                elapsed = interval.start + (interval.duration - t)
+                term.status(f"{PHASE_NAMES[interval.phase]:>10}  {t:3d}s   {format_time(elapsed)} / {format_time(timeline.total)}")
+                if t <= COUNTDOWN_BELLS:
+                    term.ring()
+        except KeyboardInterrupt:
+            if time.monotonic() - last_interrupt < QUIT_WINDOW:
+                term.line("Stopped.")
+                return False
+            last_interrupt = time.monotonic()
+            skipped = True
+            anchor = None
+        record_interval(interval, time.monotonic() - started, skipped, workout_id, sequence_name, user)
+        if anchor is None:
+            # After a skip the next interval starts now
+            anchor = time.monotonic() - (interval.start + interval.duration)
+
+    record_workout("hiit", sequence_name, workout_id, user)
+    term.line(f"Workout complete: {format_time(timeline.total)}")
+    term.ring(3)
+    return True
+
+# ---------------------------
+# Strength
+# ---------------------------
+def ask(prompt):
+    try:
+        return input(prompt).strip().lower()
+    except EOFError:
+        return "q"
+
+def run_strength(cfg, sequence_name, term, user=DEFAULT_USER):
+    exercises = cfg["exercise_sequences"][sequence_name]
+    term.line(f"{sequence_name} · {len(exercises)} exercises")
+    for n, raw_ex in enumerate(exercises, 1):
+        current_ex = raw_ex
+        if isinstance(raw_ex, tuple):
+            options = " / ".join(f"{i}) {name}" for i, name in enumerate(raw_ex, 1))
+            answer = ask(f"Variation for exercise {n}: {options} [1] ")
+            if answer == "q":
+                return False
+            current_ex = raw_ex[int(answer) - 1] if answer.isdigit() and 1 <= int(answer) <= len(raw_ex) else raw_ex[0]
+
+        spec = spec_for(current_ex)
+        term.line("")
+        term.line(f"{n}/{len(exercises)}  {current_ex}  —  sets {spec.sets_text}, reps {spec.reps_text}")
+        for cue in spec.cues:
+            term.line(f"    · {cue}")
+        for set_index in range(spec.max_sets):
+            answer = ask(f"  Set {set_index + 1} of {spec.max_sets}: Enter when done, s to skip the exercise, q to quit ")
+            if answer == "q":
+                return False
+            if answer == "s":
+                break
+            record_set(current_ex, set_index + 1, sequence_name,
+                       variations=list(raw_ex) if isinstance(raw_ex, tuple) else None, user=user)
+            term.ring()
+
+    record_workout("strength", sequence_name, user=user)
+    term.line("Strength session complete!")
+    term.ring(3)
+    return True
+
+# ---------------------------
+# Entry point
+# ---------------------------
+def run_program_day(cfg, term, user=DEFAULT_USER):
+    program = program_for(cfg)
+    position = position_for(cfg, program)
+    today = day_info(program, position)
+    term.line(f"{program.name} · Day {today.number}: {today.name}")
+    if today.type == "rest":
+        done = ask("Rest day. Enter to mark it done, q to quit ") != "q"
+    elif today.type == "strength":
+        done = run_strength(cfg, today.sequence, term, user)
+    else:
+        done = run_hiit(cfg, today.sequence, cfg.get("workout_format"), term, user)
+    if done:
+        next_day, wrapped = next_position(program, position)
+        save_position(cfg, program, next_day, user)
+        term.line("Regime completed! Starting over." if wrapped else f"Next up: {day_info(program, next_day).name}")
+    return done
+
+def main():
+    parser = argparse.ArgumentParser(description="Run workouts in a terminal with bell cues.")
+    parser.add_argument("mode", nargs="?", choices=("program", "hiit", "strength"), default="program")
+    parser.add_argument("--sequence", help="sequence name from hiit_config.json")
+    parser.add_argument("--format", help="workout format for HIIT (default: the user's saved one)")
+    parser.add_argument("--user", default=DEFAULT_USER)
+    parser.add_argument("--no-bell", action="store_true")
+    args = parser.parse_args()
+
+    cfg = load_config(args.user)
+    term = Terminal(bell=not args.no_bell)
+    categories = cfg.get("sequence_categories", {})
+    if args.mode != "program":
+        sequence = args.sequence or next((s for s, kind in categories.items() if kind == args.mode), None)
+        if sequence not in cfg["exercise_sequences"]:
+            parser.error(f"unknown sequence {sequence!r}; choose from: {', '.join(cfg['exercise_sequences'])}")
+
+    try:
+        if args.mode == "program":
+            done = run_program_day(cfg, term, args.user)
+        elif args.mode == "hiit":
+            done = run_hiit(cfg, sequence, args.format or cfg.get("workout_format"), term, args.user)
+        else:
+            done = run_strength(cfg, sequence, term, args.user)
+    except ValueError as e:
+        # A workout format that can't run with these settings (e.g. EMOM work >= 60s)
+        parser.error(str(e))
+    except KeyboardInterrupt:
+        term.line("Stopped.")
+        done = False
+    raise SystemExit(0 if done else 1)
+
+if __name__ == "__main__":
+    main()
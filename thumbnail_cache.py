@@ -0,0 +1,86 @@
+import io
+import os
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+
+from asset_index import file_digest
+
+THUMB_DIR = Path(".cache/thumbnails")
+PREVIEW_SECONDS = 2.0
+
+# ---------------------------
+# Disk-backed thumbnail cache
+# ---------------------------
+# Entries are keyed by source content hash + width, so an edited source simply
+# maps to a new entry and is rebuilt on first use.
+def thumbnail_for(path, width=200, animated=False):
+    src = Path(path)
+    try:
+        stat = src.stat()
+    except OSError:
+        return path
+    digest = _content_hash(str(src), stat.st_size, stat.st_mtime_ns)
+    # A single-frame source asked for animated is written as JPEG, so the suffix
+    # follows the format actually stored
+    stem = THUMB_DIR / f"{digest[:16]}-{width}{'-anim' if animated else ''}"
+    for suffix in (".gif", ".jpg") if animated else (".jpg",):
+        cached = stem.with_name(stem.name + suffix)
+        if cached.exists():
+            return cached.as_posix()
+    try:
+        data, suffix = _render(src, width, animated)
+    except Exception:
+        # A broken or exotic source still shows up, just at full size
+        return path
+    out = stem.with_name(stem.name + suffix)
+    try:
+        _write_atomic(out, data)
+    except OSError:
+        # e.g. a read-only .cache: show the source rather than fail the page
+        return path
+    return out.as_posix()
+
+@lru_cache(maxsize=512)
+def _content_hash(path, size, mtime_ns):
+    # size/mtime_ns only key the memo: files are re-hashed when they change
+    return file_digest(path)
+
+def _render(src, width, animated):
+    from PIL import Image, ImageSequence
+
+    buf = io.BytesIO()
+    with Image.open(src) as im:
+        height = max(1, round(im.size[1] * width / im.size[0]))
+        if not animated or getattr(im, "n_frames", 1) == 1:
+            still = Image.new("RGB", im.size, "white")
+            frame = im.convert("RGBA")
+            still.paste(frame, mask=frame)
+            still.resize((width, height), Image.LANCZOS).save(buf, format="JPEG", quality=80)
+            return buf.getvalue(), ".jpg"
+
+        frames, durations, shown = [], [], 0
+        for frame in ImageSequence.Iterator(im):
+            duration = frame.info.get("duration", im.info.get("duration", 100))
+            frames.append(frame.convert("RGB").resize((width, height), Image.LANCZOS))
+            durations.append(duration)
+            shown += duration / 1000
+            if shown >= PREVIEW_SECONDS:
+                break
+        frames[0].save(buf, format="GIF", save_all=True, append_images=frames[1:],
+                       duration=durations, loop=0, optimize=True)
+        return buf.getvalue(), ".gif"
+
+def _write_atomic(out, data):
+    out.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=out.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, out)
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
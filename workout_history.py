@@ -0,0 +1,195 @@
+import datetime
+import json
+import time
+
+from state_store import DEFAULT_USER, connect
+
+# ---------------------------
+# Append-only history with rollups
+# ---------------------------
+# Raw events are only ever inserted. Each insert bumps the matching rollup
+# rows in the same transaction, so dashboard queries read a handful of
+# pre-aggregated rows however many years of events exist.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, user TEXT NOT NULL, at REAL NOT NULL,
+    kind TEXT NOT NULL, workout_id TEXT, sequence TEXT, exercise TEXT, phase TEXT,
+    planned REAL, actual REAL, skipped INTEGER NOT NULL DEFAULT 0, detail TEXT);
+CREATE TABLE IF NOT EXISTS weekly_volume (
+    user TEXT NOT NULL, week TEXT NOT NULL, exercise TEXT NOT NULL,
+    intervals INTEGER NOT NULL DEFAULT 0, work_seconds REAL NOT NULL DEFAULT 0,
+    sets INTEGER NOT NULL DEFAULT 0, skips INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user, week, exercise));
+CREATE TABLE IF NOT EXISTS rest_rollup (
+    user TEXT NOT NULL, phase TEXT NOT NULL, count INTEGER NOT NULL DEFAULT 0,
+    planned REAL NOT NULL DEFAULT 0, actual REAL NOT NULL DEFAULT 0,
+    skips INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (user, phase));
+CREATE TABLE IF NOT EXISTS streaks (
+    user TEXT PRIMARY KEY, last_day TEXT NOT NULL, current INTEGER NOT NULL,
+    longest INTEGER NOT NULL, workouts INTEGER NOT NULL);
+"""
+
+def _open():
+    conn = connect()
+    conn.executescript(SCHEMA)
+    if "skips" not in {row[1] for row in conn.execute("PRAGMA table_info(rest_rollup)")}:
+        _rebuild_rest_rollup(conn)
+    return conn
+
+def _rebuild_rest_rollup(conn):
+    # Older rollups left skipped rests out; recount every rest from the raw events
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if "skips" not in {row[1] for row in conn.execute("PRAGMA table_info(rest_rollup)")}:
+            conn.execute("ALTER TABLE rest_rollup ADD COLUMN skips INTEGER NOT NULL DEFAULT 0")
+            conn.execute("DELETE FROM rest_rollup")
+            conn.execute(
+                "INSERT INTO rest_rollup (user, phase, count, planned, actual, skips)"
+                " SELECT user, phase, COUNT(*), SUM(planned), SUM(actual), SUM(skipped) FROM history_events"
+                " WHERE kind = 'interval' AND phase NOT IN ('work', 'prepare') GROUP BY user, phase"
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+def _week(at):
+    year, week, _ = datetime.date.fromtimestamp(at).isocalendar()
+    return f"{year}-W{week:02d}"
+
+def _append(user, statements):
+    # Runs the event insert and its rollup upserts as one transaction
+    conn = _open()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, args in statements:
+                conn.execute(sql, args)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+def _event(user, at, kind, **fields):
+    fields = {k: v for k, v in fields.items() if v is not None}
+    if "detail" in fields:
+        fields["detail"] = json.dumps(fields["detail"], separators=(",", ":"))
+    cols = ["user", "at", "kind", *fields]
+    sql = f"INSERT INTO history_events ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})"
+    return sql, (user, at, kind, *fields.values())
+
+def _volume(user, at, exercise, intervals=0, work_seconds=0.0, sets=0, skips=0):
+    return (
+        "INSERT INTO weekly_volume (user, week, exercise, intervals, work_seconds, sets, skips)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (user, week, exercise) DO UPDATE SET"
+        " intervals = intervals + excluded.intervals, work_seconds = work_seconds + excluded.work_seconds,"
+        " sets = sets + excluded.sets, skips = skips + excluded.skips",
+        (user, _week(at), exercise, intervals, work_seconds, sets, skips),
+    )
+
+# ---------------------------
+# Recording
+# ---------------------------
+def record_interval(interval, actual, skipped, workout_id, sequence, user=DEFAULT_USER):
+    at = time.time()
+    statements = [_event(
+        user, at, "interval", workout_id=str(workout_id), sequence=sequence, exercise=interval.exercise,
+        phase=interval.phase, planned=interval.duration, actual=round(actual, 3), skipped=int(skipped),
+        detail={"round": interval.round, "index": interval.index},
+    )]
+    if interval.phase == "work":
+        statements.append(_volume(user, at, interval.exercise, intervals=int(not skipped),
+                                  work_seconds=actual, skips=int(skipped)))
+    elif interval.phase != "prepare":
+        # Skipped rests count with the time actually taken; skipping is how rest gets cut short
+        statements.append((
+            "INSERT INTO rest_rollup (user, phase, count, planned, actual, skips) VALUES (?, ?, 1, ?, ?, ?)"
+            " ON CONFLICT (user, phase) DO UPDATE SET count = count + 1, planned = planned + excluded.planned,"
+            " actual = actual + excluded.actual, skips = skips + excluded.skips",
+            (user, interval.phase, interval.duration, actual, int(skipped)),
+        ))
+    _append(user, statements)
+
+def record_set(exercise, set_number, sequence, variations=None, user=DEFAULT_USER):
+    at = time.time()
+    _append(user, [
+        _event(user, at, "set", sequence=sequence, exercise=exercise,
+               detail={"set": set_number, "variations": variations} if variations else {"set": set_number}),
+        _volume(user, at, exercise, sets=1),
+    ])
+
+def record_workout(kind, sequence, workout_id=None, user=DEFAULT_USER):
+    at = time.time()
+    today = datetime.date.fromtimestamp(at)
+    conn = _open()
+    try:
+        # Read and update the streak under one write lock, so concurrent completions can't lose a count
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT last_day, current, longest, workouts FROM streaks WHERE user = ?", (user,)).fetchone()
+            if row is None:
+                last_day, current, longest, workouts = None, 0, 0, 0
+            else:
+                last_day, current, longest, workouts = datetime.date.fromisoformat(row[0]), *row[1:]
+            if last_day != today:
+                current = current + 1 if last_day == today - datetime.timedelta(days=1) else 1
+            longest = max(longest, current)
+            conn.execute(*_event(user, at, "workout", workout_id=None if workout_id is None else str(workout_id),
+                                 sequence=sequence, phase=kind))
+            conn.execute(
+                "INSERT INTO streaks (user, last_day, current, longest, workouts) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (user) DO UPDATE SET last_day = excluded.last_day, current = excluded.current,"
+                " longest = excluded.longest, workouts = excluded.workouts",
+                (user, today.isoformat(), current, longest, workouts + 1),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+
+# ---------------------------
+# Queries (rollups only)
+# ---------------------------
+def weekly_volume(weeks=4, user=DEFAULT_USER):
+    # {week: [(exercise, intervals, work_seconds, sets, skips), ...]} for the last `weeks` ISO weeks
+    now = time.time()
+    keys = sorted({_week(now - 7 * 86400 * i) for i in range(weeks)})
+    conn = _open()
+    try:
+        rows = conn.execute(
+            f"SELECT week, exercise, intervals, work_seconds, sets, skips FROM weekly_volume"
+            f" WHERE user = ? AND week IN ({', '.join('?' * len(keys))}) ORDER BY week DESC, exercise",
+            (user, *keys),
+        ).fetchall()
+    finally:
+        conn.close()
+    volume = {}
+    for week, *rest in rows:
+        volume.setdefault(week, []).append(tuple(rest))
+    return volume
+
+def streak(user=DEFAULT_USER):
+    # (current, longest, total workouts); a streak lapses once a full day is missed
+    conn = _open()
+    try:
+        row = conn.execute("SELECT last_day, current, longest, workouts FROM streaks WHERE user = ?", (user,)).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return 0, 0, 0
+    last_day = datetime.date.fromisoformat(row[0])
+    current = row[1] if (datetime.date.today() - last_day).days <= 1 else 0
+    return current, row[2], row[3]
+
+def average_rest(user=DEFAULT_USER):
+    # {phase: (average planned, average actually taken, rests skipped)}
+    conn = _open()
+    try:
+        rows = conn.execute("SELECT phase, count, planned, actual, skips FROM rest_rollup WHERE user = ?", (user,)).fetchall()
+    finally:
+        conn.close()
+    return {phase: (planned / count, actual / count, skips) for phase, count, planned, actual, skips in rows if count}
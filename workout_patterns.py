@@ -0,0 +1,121 @@
+from collections import namedtuple
+from functools import lru_cache
+
+# ---------------------------
+# Round plans
+# ---------------------------
+# A plan is the shape of a workout independent of timing: a tuple of rounds,
+# each a tuple of 1-based exercise indices, plus anything the format fixes.
+#   peak_round     round followed by the longer peak rest (0 for none)
+#   timing         settings the format pins (e.g. Tabata's 20s/10s)
+#   round_seconds  EMOM-style: each round fills this many seconds, the rest is rest
+#   time_cap       AMRAP-style: each round cycles its exercises until this many seconds are up
+Plan = namedtuple("Plan", ["pattern", "rounds", "labels", "peak_round", "timing", "round_seconds", "time_cap"])
+
+DEFAULT_PATTERN = "pyramid"
+DEFAULT_FORMATS = {"Pyramid": {"pattern": DEFAULT_PATTERN}}
+
+def _span(lo, hi):
+    step = 1 if hi >= lo else -1
+    return tuple(range(lo, hi + step, step))
+
+def _pyramid(n, height=None):
+    # 1, 1-2, ... 1-h, then h-..-2 down to h: the original 1→5→1 pyramid for n=5
+    h = min(height or n, n)
+    up = [_span(1, k) for k in range(1, h + 1)]
+    down = [_span(h, k) for k in range(2, h + 1)]
+    return up + down, len(up), {}, None, None
+
+def _ladder(n, height=None):
+    h = min(height or n, n)
+    return [_span(1, k) for k in range(1, h + 1)], 0, {}, None, None
+
+def _circuit(n, rounds=3):
+    return [_span(1, n)] * rounds, 0, {}, None, None
+
+def _tabata(n, rounds=8, work=20, rest=10):
+    # One round per exercise: `rounds` bouts of it with short rests between
+    return [(i,) * rounds for i in range(1, n + 1)], 0, {
+        "work_time": work, "rest_between_exercises": rest}, None, None
+
+def _emom(n, minutes=12):
+    # Every minute on the minute, cycling through the exercises
+    return [((m % n) + 1,) for m in range(minutes)], 0, {}, 60, None
+
+def _amrap(n, blocks=2, minutes=8, transition=5):
+    # Timed blocks: as many laps of the sequence as fit in `minutes`, short transitions between
+    return [_span(1, n)] * blocks, 0, {"rest_between_exercises": transition}, None, minutes * 60
+
+def _superset(n, sets=3):
+    # Consecutive pairs alternated for `sets` rounds each; an odd last exercise goes alone
+    pairs = [_span(i, min(i + 1, n)) for i in range(1, n + 1, 2)]
+    return [pair for pair in pairs for _ in range(sets)], 0, {}, None, None
+
+PATTERNS = {
+    "pyramid": _pyramid,
+    "ladder": _ladder,
+    "circuit": _circuit,
+    "tabata": _tabata,
+    "emom": _emom,
+    "amrap": _amrap,
+    "superset": _superset,
+}
+
+def _label(idxs):
+    # Repeats are folded: (1, 1, 1) -> "1×3", (1, 2, 1, 2) -> "1-2×2"
+    for period in range(1, len(idxs) // 2 + 1):
+        if len(idxs) % period == 0 and idxs == idxs[:period] * (len(idxs) // period):
+            return "-".join(str(i) for i in idxs[:period]) + f"×{len(idxs) // period}"
+    return "-".join(str(i) for i in idxs)
+
+@lru_cache(maxsize=64)
+def _plan(pattern, length, params):
+    if pattern not in PATTERNS:
+        raise ValueError(f"Unknown workout pattern {pattern!r}; expected one of {', '.join(PATTERNS)}")
+    if length < 1:
+        raise ValueError("A workout needs at least one exercise")
+    try:
+        rounds, peak_round, timing, round_seconds, time_cap = PATTERNS[pattern](length, **dict(params))
+    except TypeError as e:
+        raise ValueError(f"Bad parameters for the {pattern} pattern: {e}") from None
+    rounds = tuple(tuple(r) for r in rounds if r)
+    if time_cap is not None and time_cap <= 0:
+        raise ValueError(f"The {pattern} pattern needs a positive time cap")
+    labels = tuple(_label(r) for r in rounds)
+    if time_cap:
+        labels = tuple(f"{label} ⟳ {time_cap // 60}:{time_cap % 60:02d}" for label in labels)
+    return Plan(
+        pattern=pattern,
+        rounds=rounds,
+        labels=labels,
+        peak_round=peak_round if len(rounds) > 1 else 0,
+        timing=tuple(sorted(timing.items())),
+        round_seconds=round_seconds,
+        time_cap=time_cap,
+    )
+
+def build_plan(pattern, length, **params):
+    # Memoized per (pattern, sequence length, parameters)
+    return _plan(pattern, length, tuple(sorted(params.items())))
+
+def plan_for_format(fmt, length):
+    # A "workout_formats" catalog entry: {"pattern": ..., <generator parameters>...}
+    fmt = dict(fmt or {})
+    return build_plan(fmt.pop("pattern", DEFAULT_PATTERN), length, **fmt)
+
+def plan_timing(plan, cfg):
+    # The user's timing settings with whatever the format pins applied on top
+    timing = {
+        "work_time": cfg.get("work_time", 30),
+        "rest_between_exercises": cfg.get("rest_between_exercises", 45),
+        "rest_between_rounds": cfg.get("rest_between_rounds", 60),
+        "peak_rest": cfg.get("peak_rest", 75),
+        **dict(plan.timing),
+    }
+    if plan.round_seconds:
+        if timing["work_time"] >= plan.round_seconds:
+            # Otherwise every round would run straight into the next with no rest at all
+            raise ValueError(f"Work ({timing['work_time']}s) must be shorter than the "
+                             f"{plan.round_seconds}s {plan.pattern.upper()} round")
+        timing["rest_between_rounds"] = plan.round_seconds - timing["work_time"]
+    return timing
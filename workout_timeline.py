@@ -0,0 +1,173 @@
+import random
+from bisect import bisect_right
+from collections import namedtuple
+from functools import lru_cache
+
+from workout_patterns import DEFAULT_PATTERN, build_plan, plan_timing
+
+PREPARE_SECONDS = 10
+# A rest shows a new stretch every this many seconds
+REST_SWAP_SECONDS = 15
+
+# ---------------------------
+# Round shape
+# ---------------------------
+def default_plan(length):
+    return build_plan(DEFAULT_PATTERN, length)
+
+def round_exercises(round_num, full_list, plan=None):
+    plan = plan or default_plan(len(full_list))
+    return [full_list[i-1] for i in plan.rounds[round_num - 1]]
+
+# ---------------------------
+# Compiled timeline
+# ---------------------------
+# One entry per countdown. For rests, exercise/image describe what comes next.
+Interval = namedtuple(
+    "Interval",
+    ["index", "phase", "round", "exercise_index", "exercise", "image", "start", "duration"],
+)
+Timeline = namedtuple(
+    "Timeline",
+    ["intervals", "starts", "total", "labels", "peak_round", "next_work"],
+)
+
+def compile_timeline(sequence, cfg, images=None, plan=None):
+    images = images or {}
+    sequence = tuple(sequence)
+    plan = plan or default_plan(len(sequence))
+    timing = plan_timing(plan, cfg)
+    return _compile(
+        sequence,
+        tuple(images.get(ex) for ex in sequence),
+        plan.rounds,
+        plan.labels,
+        plan.peak_round,
+        timing["work_time"],
+        timing["rest_between_exercises"],
+        timing["rest_between_rounds"],
+        timing["peak_rest"],
+        plan.time_cap,
+    )
+
+@lru_cache(maxsize=64)
+def _compile(sequence, images, indices, labels, peak_round, work, rest_exercise, rest_round, peak_rest, time_cap=None):
+    if time_cap and work <= 0:
+        raise ValueError("A time-capped round needs a positive work time")
+    for idxs in indices:
+        for i in idxs:
+            if not 1 <= i <= len(sequence):
+                raise ValueError(f"Round index {i} is outside a {len(sequence)}-exercise sequence")
+
+    intervals = []
+    start = 0
+
+    def add(phase, round_num, target_round, pos, duration):
+        nonlocal start
+        if duration <= 0 and phase != "work":
+            # e.g. EMOM when the work fills the whole minute
+            return
+        i = indices[target_round - 1][pos] - 1
+        intervals.append(Interval(len(intervals), phase, round_num, pos, sequence[i], images[i], start, duration))
+        start += duration
+
+    add("prepare", 1, 1, 0, PREPARE_SECONDS)
+    for r, idxs in enumerate(indices, 1):
+        if time_cap:
+            # Laps of the round until the cap; the last interval is cut short to end on it
+            end, lap = start + time_cap, 0
+            while start < end:
+                pos = lap % len(idxs)
+                add("work", r, r, pos, min(work, end - start))
+                if start < end:
+                    add("rest_exercise", r, r, (pos + 1) % len(idxs), min(rest_exercise, end - start))
+                lap += 1
+            if r < len(indices):
+                add("rest_round", r, r + 1, 0, peak_rest if r == peak_round else rest_round)
+            continue
+        for pos in range(len(idxs)):
+            add("work", r, r, pos, work)
+            if pos + 1 < len(idxs):
+                add("rest_exercise", r, r, pos + 1, rest_exercise)
+            elif r < len(indices):
+                add("rest_round", r, r + 1, 0, peak_rest if r == peak_round else rest_round)
+
+    next_work = [None] * len(intervals)
+    upcoming = None
+    for iv in reversed(intervals):
+        next_work[iv.index] = upcoming
+        if iv.phase == "work":
+            upcoming = iv.index
+
+    return Timeline(
+        intervals=tuple(intervals),
+        starts=tuple(iv.start for iv in intervals),
+        total=start,
+        labels=labels,
+        peak_round=peak_round,
+        next_work=tuple(next_work),
+    )
+
+# ---------------------------
+# Lookups
+# ---------------------------
+def interval_at(timeline, elapsed):
+    pos = bisect_right(timeline.starts, elapsed) - 1
+    return timeline.intervals[min(max(pos, 0), len(timeline.intervals) - 1)]
+
+def progress_fraction(timeline, elapsed):
+    if not timeline.total:
+        return 0.0
+    return min(1.0, max(0.0, elapsed / timeline.total))
+
+def next_up(timeline, index):
+    nxt = timeline.next_work[index]
+    return None if nxt is None else timeline.intervals[nxt]
+
+def upcoming_media(timeline, index, count=2, playlist=None, slots=None):
+    # Images of the next `count` work intervals after `index`, plus the next
+    # interval's stretches when it is a rest (its first `slots`, or all), for prefetching
+    paths = []
+    nxt = timeline.next_work[index] if index < len(timeline.intervals) else None
+    while nxt is not None and len(paths) < count:
+        image = timeline.intervals[nxt].image
+        if image and image not in paths:
+            paths.append(image)
+        nxt = timeline.next_work[nxt]
+    if playlist and index + 1 < len(playlist):
+        paths.extend(p for p in dict.fromkeys(playlist[index + 1][:slots]) if p not in paths)
+    return paths
+
+# ---------------------------
+# Rest media playlist
+# ---------------------------
+# Chosen once per workout: for each rest, one stretch per REST_SWAP_SECONDS slot,
+# preferring stretches for the muscles the preceding work intervals used. The
+# same seed (the workout id) always gives the same playlist, so a resumed
+# workout shows the same media and the browser keeps hitting its cache.
+def rest_playlist(timeline, seed, stretches, muscles, swap=REST_SWAP_SECONDS):
+    # tuple indexed like timeline.intervals; () for intervals that aren't rests
+    rng = random.Random(seed)
+    playlist = []
+    worked = set()
+    for iv in timeline.intervals:
+        if iv.phase == "work":
+            worked.update(muscles.get(iv.exercise, ()))
+            playlist.append(())
+            continue
+        if iv.phase == "prepare" or not stretches:
+            playlist.append(())
+            continue
+        ranked = sorted(stretches, key=lambda s: (-len(worked.intersection(stretches[s])), rng.random()))
+        matched = [s for s in ranked if worked.intersection(stretches[s])] or ranked
+        slots = max(1, -(-iv.duration // swap))
+        playlist.append(tuple(matched[i % len(matched)] for i in range(slots)))
+        if iv.phase == "rest_round":
+            worked = set()
+    return tuple(playlist)
+
+def stretch_at(playlist, interval, remaining, swap=REST_SWAP_SECONDS):
+    slots = playlist[interval.index]
+    if not slots:
+        return None
+    return slots[min(len(slots) - 1, int(interval.duration - remaining) // swap)]